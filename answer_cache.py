@@ -0,0 +1,129 @@
+# answer_cache.py
+import math
+import os
+import re
+
+from utils.cache import TTLCache
+
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# (repo_id, commit) -> TTLCache(normalized question -> entry)
+_BUCKETS = TTLCache(maxsize=512)
+
+_STATS = {"exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+
+def normalize_question(question: str) -> str:
+    q = question.lower().strip()
+    q = re.sub(r"\s+", " ", q)
+    return q.rstrip("?!. ")
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return None
+    return [x / norm for x in vector]
+
+
+def _bucket(repo_id: str, commit: str | None, create: bool = False):
+    bucket = _BUCKETS.get((repo_id, commit))
+    if bucket is None and create:
+        bucket = TTLCache(maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+        _BUCKETS.set((repo_id, commit), bucket)
+    return bucket
+
+
+def lookup_exact(repo_id: str, commit: str | None, question: str):
+    """
+    Exact (normalized) match only; needs no embedding.
+    A miss isn't counted here: the caller goes on to lookup_answer().
+    """
+    bucket = _bucket(repo_id, commit)
+    if bucket is None:
+        return None
+
+    entry = bucket.get(normalize_question(question))
+    if entry is None:
+        return None
+
+    _STATS["exact_hits"] += 1
+    return entry["response"]
+
+
+def lookup_answer(
+    repo_id: str,
+    commit: str | None,
+    question: str,
+    embedding: list[float] | None = None,
+):
+    """
+    Returns a cached response dict or None.
+    Exact (normalized) match first, then the most similar
+    cached question above ANSWER_CACHE_SIMILARITY.
+    """
+    bucket = _bucket(repo_id, commit)
+    if bucket is None:
+        _STATS["misses"] += 1
+        return None
+
+    entry = bucket.get(normalize_question(question))
+    if entry is not None:
+        _STATS["exact_hits"] += 1
+        return entry["response"]
+
+    query = _unit(embedding) if embedding else None
+    if query is not None:
+        best, best_score = None, ANSWER_CACHE_SIMILARITY
+        for key, candidate in bucket.items():
+            if candidate["embedding"] is None:
+                continue
+            score = sum(a * b for a, b in zip(query, candidate["embedding"]))
+            if score >= best_score:
+                best, best_score = key, score
+
+        if best is not None:
+            # Touch through get() so LRU order reflects the hit
+            entry = bucket.get(best)
+            if entry is not None:
+                _STATS["similar_hits"] += 1
+                return entry["response"]
+
+    _STATS["misses"] += 1
+    return None
+
+
+def store_answer(
+    repo_id: str,
+    commit: str | None,
+    question: str,
+    response: dict,
+    embedding: list[float] | None = None,
+):
+    bucket = _bucket(repo_id, commit, create=True)
+    bucket.set(normalize_question(question), {
+        "embedding": _unit(embedding) if embedding else None,
+        "response": response,
+    })
+
+
+def invalidate_repo(repo_id: str):
+    """
+    Drop every cached answer for a repo (all commits).
+    Called whenever the repo is (re-)indexed.
+    """
+    for key, _ in _BUCKETS.items():
+        if key[0] == repo_id:
+            _BUCKETS.pop(key)
+
+
+def answer_cache_stats() -> dict:
+    lookups = sum(_STATS.values())
+    hits = _STATS["exact_hits"] + _STATS["similar_hits"]
+    return {
+        **_STATS,
+        "repos": len(_BUCKETS),
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+    }
@@ -10,14 +10,11 @@ from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 
 from auth.api_key import generate_api_key, hash_api_key
-from supabase import create_client
-import os
+from auth.key_cache import invalidate_api_key
+from utils.db import get_supabase
 
-# Supabase client (same pattern as main.py)
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY"),
-)
+# Shared pooled client (same as main.py)
+supabase = get_supabase()
 
 
 # -----------------------------
@@ -113,6 +110,8 @@ def revoke_api_key_internal(
         "status": "revoked"
     }).eq("id", target_key_id).execute()
 
+    invalidate_api_key(target_key_id)
+
     return {"status": "revoked"}
 
 
@@ -194,4 +193,171 @@ def update_api_key_internal(
             update_payload
         ).eq("id", key_id).execute()
 
+        invalidate_api_key(key_id)
+
     return {"status": "updated"}
+
+
+# -----------------------------
+# USAGE REPORTS (AGGREGATED + PAGINATED)
+# -----------------------------
+# Schema assumed for api_usage_logs (Supabase):
+#   id bigint generated always as identity primary key  -- keyset cursor
+#   api_key_id, request_id, endpoint, method, error_message text
+#   status_code, duration_ms integer
+#   created_at timestamptz default now()
+#   index on (api_key_id, created_at desc, id desc)
+USAGE_LOG_PAGE_SIZE = 50
+USAGE_LOG_MAX_PAGE_SIZE = 500
+
+# None until the first summary query tells whether PostgREST
+# aggregates (count()) are enabled; Supabase ships them disabled
+_AGGREGATES_ENABLED = None
+
+USAGE_LOG_FIELDS = (
+    "id, endpoint, method, status_code, duration_ms, created_at, request_id, error_message"
+)
+
+
+def usage_summary_internal(
+    *,
+    key_ids: list[str],
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """
+    {key_id: {"total_requests", "error_count"}} from ONE grouped query
+    (api_key_id, status_code, count) instead of downloading the logs.
+    Where PostgREST aggregates are disabled, falls back to two exact
+    counts per key (still no log rows transferred).
+    """
+    global _AGGREGATES_ENABLED
+
+    summary = {
+        key_id: {"total_requests": 0, "error_count": 0}
+        for key_id in key_ids
+    }
+    if not key_ids:
+        return summary
+
+    if _AGGREGATES_ENABLED is not False:
+        try:
+            rows = _grouped_usage_rows(key_ids, since, until)
+            _AGGREGATES_ENABLED = True
+        except Exception:
+            if _AGGREGATES_ENABLED:
+                raise  # aggregates worked before: a real failure
+            _AGGREGATES_ENABLED = False
+
+    if not _AGGREGATES_ENABLED:
+        for key_id in key_ids:
+            summary[key_id] = {
+                "total_requests": _count_usage(key_id, since, until),
+                "error_count": _count_usage(key_id, since, until, errors_only=True),
+            }
+        return summary
+
+    for row in rows:
+        usage = summary.get(row["api_key_id"])
+        if usage is None:
+            continue
+        usage["total_requests"] += row["count"]
+        if (row.get("status_code") or 0) >= 400:
+            usage["error_count"] += row["count"]
+
+    return summary
+
+
+def _grouped_usage_rows(key_ids, since, until) -> list[dict]:
+    query = (
+        supabase
+        .table("api_usage_logs")
+        .select("api_key_id, status_code, count()")
+        .in_("api_key_id", key_ids)
+    )
+    if since:
+        query = query.gte("created_at", since)
+    if until:
+        query = query.lt("created_at", until)
+
+    return query.execute().data or []
+
+
+def _count_usage(key_id, since, until, errors_only: bool = False) -> int:
+    """
+    Exact row count (head-style: limit 1, only the count is used).
+    """
+    query = (
+        supabase
+        .table("api_usage_logs")
+        .select("id", count="exact")
+        .eq("api_key_id", key_id)
+    )
+    if since:
+        query = query.gte("created_at", since)
+    if until:
+        query = query.lt("created_at", until)
+    if errors_only:
+        query = query.gte("status_code", 400)
+
+    return query.limit(1).execute().count or 0
+
+
+def _parse_log_cursor(cursor: str) -> tuple[str, int]:
+    created_at, sep, last_id = cursor.rpartition("|")
+    if not sep or not created_at or '"' in created_at:
+        raise ValueError("Invalid cursor")
+    return created_at, int(last_id)
+
+
+def usage_logs_page_internal(
+    *,
+    key_id: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = USAGE_LOG_PAGE_SIZE,
+):
+    """
+    Newest-first page of a key's logs, keyset-paginated on
+    (created_at, id) so rows sharing a timestamp are neither skipped
+    nor repeated. cursor is the previous page's next_cursor
+    ("<created_at>|<id>"); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(limit, USAGE_LOG_MAX_PAGE_SIZE))
+
+    query = (
+        supabase
+        .table("api_usage_logs")
+        .select(USAGE_LOG_FIELDS)
+        .eq("api_key_id", key_id)
+    )
+    if since:
+        query = query.gte("created_at", since)
+    if until:
+        query = query.lt("created_at", until)
+    if cursor:
+        created_at, last_id = _parse_log_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{last_id})'
+        )
+
+    # One extra row tells whether another page exists
+    rows = (
+        query
+        .order("created_at", desc=True)
+        .order("id", desc=True)
+        .limit(limit + 1)
+        .execute()
+        .data
+        or []
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+
+    return {"logs": rows, "next_cursor": next_cursor}
@@ -1,16 +1,22 @@
 # auth/dependency.py
 
-import os
 from datetime import datetime, timezone
 
 from fastapi import HTTPException, Request, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client
+from utils.db import get_supabase
 from dotenv import load_dotenv
 
 from auth.api_key import hash_api_key
-from auth.logger import log_api_usage
 from auth.api_key_service import revoke_api_key_internal
+from auth.rate_limit import RATE_LIMITER
+from auth.ip_allowlist import client_ip as resolve_client_ip, compile_allowlist
+from auth.key_cache import (
+    INVALID_KEY,
+    cache_invalid_key,
+    cache_key,
+    get_cached_key,
+)
 
 from fastapi.security import HTTPBearer
 
@@ -23,10 +29,7 @@ load_dotenv()
 # -----------------------------
 # Supabase Client
 # -----------------------------
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY"),
-)
+supabase = get_supabase()
 
 from fastapi import Security
 from fastapi.security import HTTPAuthorizationCredentials
@@ -85,23 +88,35 @@ def verify_api_key(
     raw_key = credentials.credentials.strip()
     key_hash = hash_api_key(raw_key)
 
-    # 🔥 DO NOT use .single()
-    response = (
-        supabase
-        .table("api_keys")
-        .select(
-            "id, status, user_email, expires_at, ip_allowlist, scopes"
+    # Hot path: verified rows are cached per key_hash (auth/key_cache.py)
+    key_row = get_cached_key(key_hash)
+
+    if key_row is INVALID_KEY:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    if key_row is None:
+        # 🔥 DO NOT use .single()
+        response = (
+            supabase
+            .table("api_keys")
+            # "*": optional per-key columns (rate_limits) when present
+            .select("*")
+            .eq("key_hash", key_hash)
+            .execute()
         )
-        .eq("key_hash", key_hash)
-        .execute()
-    )
 
-    rows = response.data or []
+        rows = response.data or []
 
-    if len(rows) == 0:
-        raise HTTPException(status_code=401, detail="Invalid API key")
+        if len(rows) == 0:
+            cache_invalid_key(key_hash)
+            raise HTTPException(status_code=401, detail="Invalid API key")
 
-    key_row = rows[0]
+        # Allowlist compiled once per cached row, not per request
+        key_row = {
+            **rows[0],
+            "compiled_allowlist": compile_allowlist(rows[0].get("ip_allowlist")),
+        }
+        cache_key(key_hash, key_row)
 
     # -----------------------------
     # Status check (existing behavior)
@@ -137,18 +152,13 @@ def verify_api_key(
     # -----------------------------
     # IP allowlist guard (existing behavior)
     # -----------------------------
-    ip_allowlist = key_row.get("ip_allowlist")
+    # IPs and CIDRs; X-Forwarded-For only honoured from TRUSTED_PROXIES
+    allowlist = key_row.get("compiled_allowlist")
 
-    if ip_allowlist:
-        client_ip = request.client.host if request.client else None
+    if allowlist is not None:
+        client_ip = resolve_client_ip(request)
 
-        # Support both list and {"ips": [...]} formats
-        if isinstance(ip_allowlist, dict):
-            allowed_ips = ip_allowlist.get("ips", [])
-        else:
-            allowed_ips = ip_allowlist
-
-        if client_ip not in allowed_ips:
+        if client_ip not in allowlist:
             raise HTTPException(
                 status_code=403,
                 detail=f"IP {client_ip} is not allowed to use this API key",
@@ -174,16 +184,21 @@ def verify_api_key(
     # -----------------------------
     # Expose api_key_id (existing behavior)
     # -----------------------------
+    # Set before the rate limit so throttled 429s are logged to the key
     request.state.api_key_id = api_key_id
 
     # -----------------------------
-    # Log usage (existing behavior)
+    # Rate limit (per key + endpoint class, 429 + Retry-After)
     # -----------------------------
-    log_api_usage(
-        api_key_id=api_key_id,
-        endpoint=request.url.path
+    RATE_LIMITER.check(
+        api_key_id,
+        request.url.path,
+        key_row.get("rate_limits"),
     )
 
+    # Usage is logged once per request by RequestLoggingMiddleware,
+    # which picks api_key_id up from request.state
+
     return api_key_id
 
 
@@ -0,0 +1,105 @@
+# auth/ip_allowlist.py
+
+import ipaddress
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class IPAllowlist:
+    """
+    Compiled allowlist of IPs and CIDRs (IPv4 + IPv6).
+    Networks are grouped by prefix length as integer sets, so a lookup
+    costs one mask + set probe per distinct prefix length (at most
+    33 / 129), however many entries the list has.
+    """
+
+    def __init__(self, entries):
+        # (version, prefixlen) -> {network address as int}
+        self._networks = {}
+
+        for entry in entries:
+            try:
+                network = ipaddress.ip_network(str(entry).strip(), strict=False)
+            except ValueError:
+                continue  # unparsable entries never matched anyway
+
+            key = (network.version, network.prefixlen)
+            self._networks.setdefault(key, set()).add(int(network.network_address))
+
+        # Longest prefixes first: exact IPs are the common case
+        self._order = sorted(self._networks, key=lambda k: -k[1])
+
+    def __contains__(self, ip: str | None) -> bool:
+        if not ip:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        # IPv4-mapped IPv6 (::ffff:a.b.c.d) matches IPv4 entries
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        value = int(address)
+        bits = address.max_prefixlen
+
+        for version, prefixlen in self._order:
+            if version != address.version:
+                continue
+            mask = ((1 << prefixlen) - 1) << (bits - prefixlen)
+            if value & mask in self._networks[(version, prefixlen)]:
+                return True
+        return False
+
+    def __bool__(self) -> bool:
+        return bool(self._networks)
+
+
+def compile_allowlist(raw) -> IPAllowlist | None:
+    """
+    api_keys.ip_allowlist (list, or {"ips": [...]}) -> IPAllowlist,
+    None when the key has no allowlist. A set column listing no IPs
+    (e.g. {"ips": []}) compiles to an empty allowlist: every IP denied.
+    """
+    if not raw:
+        return None
+
+    # Support both list and {"ips": [...]} formats
+    if isinstance(raw, dict):
+        raw = raw.get("ips") or []
+    if isinstance(raw, str):
+        raw = [raw]
+
+    return IPAllowlist(raw)
+
+
+# Proxies / load balancers whose X-Forwarded-For is believed (CIDRs)
+TRUSTED_PROXIES = IPAllowlist(
+    p for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()
+)
+
+
+def client_ip(request) -> str | None:
+    """
+    The peer address, or - when the peer is a trusted proxy - the
+    nearest X-Forwarded-For hop that isn't one.
+    """
+    peer = request.client.host if request.client else None
+
+    if not TRUSTED_PROXIES or peer not in TRUSTED_PROXIES:
+        return peer
+
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+
+    hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+
+    return hops[0] if hops else peer
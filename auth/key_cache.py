@@ -0,0 +1,47 @@
+# auth/key_cache.py
+
+import os
+
+from utils.cache import TTLCache
+
+# Verified api_keys rows, keyed by key_hash. Revocations / updates made
+# in this process invalidate immediately; other workers see them after TTL.
+API_KEY_CACHE_TTL = float(os.getenv("API_KEY_CACHE_TTL", "30"))
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+
+# Short negative cache for unknown hashes (0 disables)
+API_KEY_NEGATIVE_TTL = float(os.getenv("API_KEY_NEGATIVE_TTL", "5"))
+
+# Marks a hash known not to exist
+INVALID_KEY = object()
+
+_KEYS = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL)
+
+
+def get_cached_key(key_hash: str):
+    """
+    Cached row, INVALID_KEY, or None on a miss.
+    """
+    return _KEYS.get(key_hash)
+
+
+def cache_key(key_hash: str, row: dict):
+    _KEYS.set(key_hash, row)
+
+
+def cache_invalid_key(key_hash: str):
+    if API_KEY_NEGATIVE_TTL > 0:
+        _KEYS.set(key_hash, INVALID_KEY, ttl=API_KEY_NEGATIVE_TTL)
+
+
+def invalidate_api_key(key_id: str):
+    """
+    Drop a key's cached row (callers only know the id, not the hash).
+    """
+    for key_hash, row in _KEYS.items():
+        if row is not INVALID_KEY and row["id"] == key_id:
+            _KEYS.pop(key_hash)
+
+
+def api_key_cache_stats() -> dict:
+    return _KEYS.stats()
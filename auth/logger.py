@@ -1,24 +1,184 @@
 # auth/logger.py
 
 import os
+import queue
+import threading
+import time
 from datetime import datetime
-from supabase import create_client
-from dotenv import load_dotenv
 
-load_dotenv()
+from starlette.concurrency import run_in_threadpool
 
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY"),
+from utils.db import get_supabase
+
+supabase = get_supabase()
+
+# -----------------------------
+# Write-behind settings
+# -----------------------------
+USAGE_LOG_QUEUE_SIZE = int(os.getenv("USAGE_LOG_QUEUE_SIZE", "10000"))
+USAGE_LOG_BATCH_SIZE = int(os.getenv("USAGE_LOG_BATCH_SIZE", "200"))
+USAGE_LOG_FLUSH_INTERVAL = float(os.getenv("USAGE_LOG_FLUSH_INTERVAL", "1.0"))
+
+# "drop": never wait, count and drop events when the queue is full
+# "block": wait up to USAGE_LOG_BLOCK_TIMEOUT for room (backpressure;
+#          from async code the wait happens in a worker thread)
+USAGE_LOG_POLICY = os.getenv("USAGE_LOG_POLICY", "drop")
+USAGE_LOG_BLOCK_TIMEOUT = float(os.getenv("USAGE_LOG_BLOCK_TIMEOUT", "0.05"))
+
+# Every row carries the same columns so batches insert in one statement
+USAGE_LOG_COLUMNS = (
+    "request_id",
+    "api_key_id",
+    "endpoint",
+    "method",
+    "status_code",
+    "duration_ms",
+    "error_message",
+    "created_at",
 )
 
 
-def log_api_usage(api_key_id: str, endpoint: str):
-    try:
-        supabase.table("api_usage_logs").insert({
-            "api_key_id": api_key_id,
-            "endpoint": endpoint,
-            "created_at": datetime.utcnow().isoformat(),
-        }).execute()
-    except Exception:
-        pass  # logging must never block API
+class UsageLogQueue:
+    """
+    Bounded in-memory queue of api_usage_logs rows, bulk-inserted by
+    one background thread when a batch fills or the interval passes.
+    Requests only pay for a queue put.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = USAGE_LOG_QUEUE_SIZE,
+        batch_size: int = USAGE_LOG_BATCH_SIZE,
+        flush_interval: float = USAGE_LOG_FLUSH_INTERVAL,
+        policy: str = USAGE_LOG_POLICY,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def put(self, event: dict):
+        self._ensure_started()
+
+        try:
+            if self.policy == "block":
+                self._queue.put(event, timeout=USAGE_LOG_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    async def put_async(self, event: dict):
+        """
+        put() for the event loop, which it never blocks: the common case
+        is a put_nowait, and only a full queue under "block" waits, off
+        the loop.
+        """
+        self._ensure_started()
+
+        try:
+            self._queue.put_nowait(event)
+            return
+        except queue.Full:
+            if self.policy != "block":
+                self.dropped += 1
+                return
+
+        await run_in_threadpool(self.put, event)
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stopped.is_set():
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="usage-log-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _next_batch(self) -> list[dict]:
+        """
+        Up to batch_size events, waiting at most flush_interval.
+        """
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _write(self, batch: list[dict]):
+        try:
+            supabase.table("api_usage_logs").insert(batch).execute()
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)  # logging must never block API
+
+    def flush(self):
+        """
+        Write everything queued so far from the calling thread.
+        """
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = 5.0):
+        """
+        Stop the flusher and write what is left (app shutdown).
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "policy": self.policy,
+        }
+
+
+USAGE_LOG = UsageLogQueue()
+
+
+async def log_usage_event(**fields):
+    """
+    Enqueue one api_usage_logs row. Never blocks on the database
+    or the event loop.
+    """
+    row = {column: fields.get(column) for column in USAGE_LOG_COLUMNS}
+    row["created_at"] = row["created_at"] or datetime.utcnow().isoformat()
+    await USAGE_LOG.put_async(row)
@@ -0,0 +1,163 @@
+# auth/rate_limit.py
+
+import math
+import os
+from abc import ABC, abstractmethod
+import threading
+import time
+import zlib
+
+from fastapi import HTTPException, Request
+
+from auth.ip_allowlist import client_ip
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -----------------------------
+# Settings
+# -----------------------------
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+
+# Requests per minute per key and endpoint class (bucket capacity = one
+# minute's worth, so short bursts pass). A key row can override these
+# with a "rate_limits" JSON column, e.g. {"chat": 120, "index": 10}.
+DEFAULT_LIMITS = {
+    "chat": int(os.getenv("RATE_LIMIT_CHAT_PER_MIN", "30")),
+    "index": int(os.getenv("RATE_LIMIT_INDEX_PER_MIN", "5")),
+    "default": int(os.getenv("RATE_LIMIT_DEFAULT_PER_MIN", "120")),
+}
+
+# Endpoint path -> class; LLM / embedding heavy routes get their own budget
+_ENDPOINT_CLASSES = (
+    ("/chat", "chat"),
+    ("/upload-repo", "index"),
+    ("/private-repo-access", "index"),
+)
+
+RATE_LIMIT_SHARDS = 64
+MAX_BUCKETS_PER_SHARD = 4096
+
+
+def endpoint_class(path: str) -> str:
+    if path.startswith("/repos/") and path.endswith("/index"):
+        return "index"
+    for prefix, name in _ENDPOINT_CLASSES:
+        if path == prefix:
+            return name
+    return "default"
+
+
+# -----------------------------
+# Backends (pluggable)
+# -----------------------------
+class RateLimitBackend(ABC):
+    """
+    acquire() takes one token from the bucket `key` and returns 0.0,
+    or the seconds until a token is available when it's empty.
+    Subclass for a shared store (e.g. Redis) across workers.
+    """
+
+    @abstractmethod
+    def acquire(self, key: str, rate: float, capacity: float) -> float:
+        ...
+
+
+class LocalTokenBucketBackend(RateLimitBackend):
+    """
+    In-process token buckets. Keys are spread over sharded locks,
+    so concurrent requests for different keys rarely contend.
+    """
+
+    def __init__(self, shards: int = RATE_LIMIT_SHARDS):
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._buckets = [{} for _ in range(shards)]
+
+    def acquire(self, key: str, rate: float, capacity: float) -> float:
+        shard = zlib.crc32(key.encode()) % len(self._locks)
+        buckets = self._buckets[shard]
+        now = time.monotonic()
+
+        with self._locks[shard]:
+            tokens, last = buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+
+            if tokens >= 1:
+                buckets[key] = (tokens - 1, now)
+                retry_after = 0.0
+            else:
+                buckets[key] = (tokens, now)
+                retry_after = (1 - tokens) / rate
+
+            if len(buckets) > MAX_BUCKETS_PER_SHARD:
+                self._prune(buckets, now, rate, capacity)
+
+        return retry_after
+
+    @staticmethod
+    def _prune(buckets: dict, now: float, rate: float, capacity: float):
+        # A bucket idle long enough to refill is the same as no bucket
+        idle = capacity / rate
+        for key, (_, last) in list(buckets.items()):
+            if now - last >= idle:
+                del buckets[key]
+
+
+def _limit_for(name: str, overrides: dict | None) -> float:
+    """
+    Per-minute limit for an endpoint class; a key's override is used
+    only when it's a finite number, otherwise the default applies.
+    """
+    default = float(DEFAULT_LIMITS[name])
+    if not isinstance(overrides, dict) or name not in overrides:
+        return default
+
+    try:
+        value = float(overrides[name])
+    except (TypeError, ValueError):
+        return default
+
+    return value if math.isfinite(value) else default
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend | None = None):
+        self.backend = backend or LocalTokenBucketBackend()
+
+    def check(self, identity: str, path: str, overrides: dict | None = None):
+        """
+        Raises 429 (with Retry-After) when identity is over its
+        per-minute budget for the endpoint class of `path`.
+        """
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        name = endpoint_class(path)
+        per_minute = _limit_for(name, overrides)
+        if per_minute <= 0:
+            return  # unlimited
+
+        retry_after = self.backend.acquire(
+            f"{identity}:{name}",
+            rate=per_minute / 60.0,
+            capacity=float(per_minute),
+        )
+
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded for {name} requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+RATE_LIMITER = RateLimiter()
+
+
+def rate_limit_by_client(request: Request):
+    """
+    Dependency for unauthenticated endpoints: limits per client IP.
+    """
+    ip = client_ip(request) or "unknown"
+    RATE_LIMITER.check(f"ip:{ip}", request.url.path)
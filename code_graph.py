@@ -0,0 +1,170 @@
+# code_graph.py
+import ast
+import os
+
+# Calls to names defined in more places than this are too ambiguous to link
+MAX_CALL_CANDIDATES = 3
+
+
+def _module_files(module: str) -> list[str]:
+    base = module.replace(".", "/")
+    return [f"{base}.py", f"{base}/__init__.py"]
+
+
+def _resolve_import(path: str, module: str | None, level: int, files: set) -> list[str]:
+    """
+    Repo files an import refers to ("a.b" -> a/b.py or a/b/__init__.py),
+    relative imports resolved against the importing file.
+    """
+    if level:
+        package = os.path.dirname(path).split("/") if "/" in path else []
+        package = package[:len(package) - (level - 1)] if level > 1 else package
+        prefix = "/".join(package)
+        module = f"{prefix}/{module.replace('.', '/')}" if module else prefix
+        module = module.strip("/").replace("/", ".")
+
+    if not module:
+        return []
+
+    return [f for f in _module_files(module) if f in files]
+
+
+class _CallCollector(ast.NodeVisitor):
+    """
+    Called names per definition (qualified name), nested
+    definitions collected separately. Module-level calls go to "".
+    """
+
+    def __init__(self):
+        self.scope = []
+        self.calls = {}
+
+    def _visit_def(self, node):
+        self.scope.append(node.name)
+        for child in node.body:
+            self.visit(child)
+        self.scope.pop()
+
+    visit_FunctionDef = _visit_def
+    visit_AsyncFunctionDef = _visit_def
+    visit_ClassDef = _visit_def
+
+    def visit_Call(self, node):
+        func = node.func
+        name = None
+        if isinstance(func, ast.Name):
+            name = func.id
+        elif isinstance(func, ast.Attribute):
+            name = func.attr
+
+        if name:
+            self.calls.setdefault(".".join(self.scope), set()).add(name)
+
+        self.generic_visit(node)
+
+
+class CodeGraph:
+    """
+    Cross-reference graph built at index time from the loaded documents:
+    symbol -> called symbols, symbol -> callers, file -> imported files.
+    Nodes are SymbolIndex ids.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.callees = {}
+        self.callers = {}
+        self.imports = {}
+
+        # file -> [(start_line, end_line, symbol_id)]
+        self.file_symbols = {}
+        self._by_qualname = {}
+
+        for sid in range(len(symbols)):
+            path = symbols.paths[symbols.files[sid]]
+            self.file_symbols.setdefault(path, []).append(
+                (symbols.starts[sid], symbols.ends[sid], sid)
+            )
+            self._by_qualname[(path, symbols.names[sid])] = sid
+
+    @classmethod
+    def build(cls, documents: list[dict], symbols) -> "CodeGraph":
+        graph = cls(symbols)
+        files = {d["metadata"]["file"].replace("\\", "/") for d in documents}
+
+        parsed = []
+        for doc in documents:
+            path = doc["metadata"]["file"].replace("\\", "/")
+            if not path.endswith(".py"):
+                continue
+            try:
+                tree = ast.parse(doc["text"])
+            except (SyntaxError, ValueError):
+                continue
+
+            imported = set()
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    for alias in node.names:
+                        imported.update(_resolve_import(path, alias.name, 0, files))
+                elif isinstance(node, ast.ImportFrom):
+                    imported.update(_resolve_import(path, node.module, node.level, files))
+                    # "from pkg import module"
+                    for alias in node.names:
+                        sub = f"{node.module}.{alias.name}" if node.module else alias.name
+                        imported.update(_resolve_import(path, sub, node.level, files))
+
+            graph.imports[path] = imported
+            parsed.append((path, tree))
+
+        for path, tree in parsed:
+            collector = _CallCollector()
+            collector.visit(tree)
+
+            for qualname, names in collector.calls.items():
+                caller = graph._by_qualname.get((path, qualname))
+                if caller is None:
+                    continue
+                for name in names:
+                    for callee in graph._resolve_call(path, name):
+                        if callee != caller:
+                            graph.callees.setdefault(caller, set()).add(callee)
+                            graph.callers.setdefault(callee, set()).add(caller)
+
+        return graph
+
+    def _resolve_call(self, path: str, name: str) -> list[int]:
+        candidates = self.symbols.by_name.get(name, [])
+        if not candidates:
+            return []
+
+        def file_of(sid):
+            return self.symbols.paths[self.symbols.files[sid]]
+
+        # Prefer same-file, then imported-file definitions
+        local = [s for s in candidates if file_of(s) == path]
+        if local:
+            return local
+
+        imported = self.imports.get(path, set())
+        via_import = [s for s in candidates if file_of(s) in imported]
+        if via_import:
+            return via_import
+
+        return candidates if len(candidates) <= MAX_CALL_CANDIDATES else []
+
+    def symbols_in_span(self, path: str, start: int, end: int) -> list[int]:
+        return [
+            sid
+            for s, e, sid in self.file_symbols.get(path, [])
+            if s <= end and e >= start
+        ]
+
+    def neighbours(self, symbol_id: int) -> list[int]:
+        """
+        Callees first (what X uses), then callers (who uses X).
+        """
+        return (
+            sorted(self.callees.get(symbol_id, ()))
+            + sorted(self.callers.get(symbol_id, ()))
+        )
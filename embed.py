@@ -1,28 +1,84 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
+import os
+
+from utils.cache import TTLCache
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_EMBEDDINGS = None
+
+# query text -> embedding (retries / follow-up buttons resend identical strings)
+QUERY_EMBEDDING_CACHE = TTLCache(
+    maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+)
+
+
+def get_embeddings():
+    """
+    Shared embedding model (loaded once per process).
+    """
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        _EMBEDDINGS = HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL
+        )
+    return _EMBEDDINGS
+
+
+def embed_query(text: str) -> list[float]:
+    vector = QUERY_EMBEDDING_CACHE.get(text)
+    if vector is None:
+        vector = get_embeddings().embed_query(text)
+        QUERY_EMBEDDING_CACHE.set(text, vector)
+    return vector
+
 
 def create_vector_store(documents):
+    """
+    Chunk ids are deterministic ("<file>#<n>") and every chunk records
+    its line span, so chunks can be addressed from the symbol index.
+    """
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=800,
-        chunk_overlap=150
+        chunk_overlap=150,
+        add_start_index=True,
     )
 
     texts = []
     metadatas = []
+    ids = []
 
     for doc in documents:
-        chunks = splitter.split_text(doc["text"])
-        for chunk in chunks:
-            texts.append(chunk)
-            metadatas.append(doc["metadata"])
+        text = doc["text"]
+        chunks = splitter.create_documents([text])
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2"
-    )
+        # Chunks come in order: count newlines incrementally
+        pos, line = 0, 1
+
+        for n, chunk in enumerate(chunks):
+            start = chunk.metadata.get("start_index", -1)
+            start_line = None
+            if start >= pos:
+                line += text.count("\n", pos, start)
+                pos = start
+                start_line = line
+
+            texts.append(chunk.page_content)
+            metadatas.append({
+                **doc["metadata"],
+                "start_line": start_line,
+                "end_line": (
+                    start_line + chunk.page_content.count("\n")
+                    if start_line is not None else None
+                ),
+            })
+            ids.append(f"{doc['metadata']['file']}#{n}")
 
     return FAISS.from_texts(
         texts=texts,
-        embedding=embeddings,
-        metadatas=metadatas
+        embedding=get_embeddings(),
+        metadatas=metadatas,
+        ids=ids,
     )
@@ -0,0 +1,113 @@
+# file_content.py
+import mmap
+import os
+import re
+from itertools import islice
+
+# Files above this size are streamed instead of embedded in JSON
+FILE_STREAM_THRESHOLD = int(os.getenv("FILE_STREAM_THRESHOLD", str(1024 * 1024)))
+
+# Max bytes of a file quoted in a chat answer
+CHAT_FILE_MAX_BYTES = int(os.getenv("CHAT_FILE_MAX_BYTES", str(32 * 1024)))
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single HTTP byte range ("bytes=0-99", "bytes=100-", "bytes=-50").
+    Returns inclusive (start, end); raises ValueError if unsatisfiable.
+    Returns None for headers to ignore (multi-range, other units, junk,
+    last before first): the caller then serves the full body, as
+    RFC 9110 requires for invalid ranges.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    if size == 0:
+        raise ValueError("Unsatisfiable range")
+
+    first, last = match.groups()
+
+    if first == "" and last == "":
+        raise ValueError("Unsatisfiable range")
+
+    if first == "":
+        # Suffix range: last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            return None  # last-pos before first-pos: invalid, so ignored
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range")
+
+    return start, end
+
+
+def iter_file_bytes(path: str, start: int = 0, end: int | None = None):
+    """
+    Yields bytes [start, end] (inclusive) of a file through mmap,
+    so large files never sit in worker memory as one string.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+
+    end = size - 1 if end is None else end
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos <= end:
+                stop = min(pos + STREAM_CHUNK_SIZE, end + 1)
+                yield mm[pos:stop]
+                pos = stop
+
+
+def valid_line_range(start_line: int | None, end_line: int | None) -> bool:
+    """
+    1-based bounds, each optional; end_line may not precede start_line.
+    """
+    if start_line is not None and start_line < 1:
+        return False
+    if end_line is not None and end_line < 1:
+        return False
+    if start_line is not None and end_line is not None and end_line < start_line:
+        return False
+    return True
+
+
+def read_lines(path: str, start_line: int | None = None, end_line: int | None = None) -> str:
+    """
+    Lines start_line..end_line (1-based, inclusive) without reading
+    the rest of the file.
+    """
+    start = max((start_line or 1) - 1, 0)
+    stop = end_line if end_line is not None else None
+
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return "".join(islice(f, start, stop))
+
+
+def read_capped(path: str, max_bytes: int = CHAT_FILE_MAX_BYTES) -> str:
+    """
+    At most max_bytes of a file as text, with a truncation marker
+    when the file is larger.
+    """
+    size = os.path.getsize(path)
+
+    with open(path, "rb") as f:
+        raw = f.read(max_bytes)
+
+    text = raw.decode("utf-8", errors="ignore")
+
+    if size > max_bytes:
+        text += f"\n\n... [truncated: showing first {max_bytes} of {size} bytes]"
+
+    return text
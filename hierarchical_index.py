@@ -0,0 +1,80 @@
+# hierarchical_index.py
+import os
+
+import numpy as np
+
+# Below this many chunks a flat scan is already cheap
+HIERARCHICAL_MIN_CHUNKS = int(os.getenv("HIERARCHICAL_MIN_CHUNKS", "20000"))
+
+# Files kept by the coarse stage
+HIERARCHICAL_TOP_FILES = int(os.getenv("HIERARCHICAL_TOP_FILES", "20"))
+
+
+def _chunk_vectors(faiss_index):
+    """
+    (ntotal, d) view of the stored vectors. Zero-copy for flat indexes,
+    a reconstructed copy otherwise.
+    """
+    if hasattr(faiss_index, "get_xb"):
+        import faiss
+        flat = faiss.rev_swig_ptr(faiss_index.get_xb(), faiss_index.ntotal * faiss_index.d)
+        return flat.reshape(faiss_index.ntotal, faiss_index.d)
+
+    return faiss_index.reconstruct_n(0, faiss_index.ntotal)
+
+
+class FileLevelIndex:
+    """
+    Coarse file-level index: one mean-pooled vector per file.
+    search() picks the top files first, then ranks only their chunks,
+    so a query never scans the whole repo and context concentrates
+    in a few files.
+    """
+
+    def __init__(self, files: list[str], centroids, positions: list):
+        self.files = files
+        self.centroids = centroids
+        self.positions = positions
+
+    @classmethod
+    def build(cls, vectorstore) -> "FileLevelIndex | None":
+        faiss_index = vectorstore.index
+        if faiss_index.ntotal < HIERARCHICAL_MIN_CHUNKS:
+            return None
+
+        by_file = {}
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            path = vectorstore.docstore.search(doc_id).metadata["file"]
+            by_file.setdefault(path, []).append(position)
+
+        vectors = _chunk_vectors(faiss_index)
+
+        files = list(by_file)
+        positions = [np.array(by_file[f], dtype=np.int64) for f in files]
+        centroids = np.stack([vectors[p].mean(axis=0) for p in positions])
+
+        return cls(files, centroids.astype(np.float32), positions)
+
+    def search(self, vectorstore, query, k: int) -> list[str]:
+        """
+        query: (1, d) float32, already normalized like the store.
+        Returns docstore ids, nearest first (L2, like the flat index).
+        """
+        q = query[0]
+
+        file_dist = ((self.centroids - q) ** 2).sum(axis=1)
+        top_files = min(HIERARCHICAL_TOP_FILES, len(self.files))
+        chosen = np.argpartition(file_dist, top_files - 1)[:top_files]
+
+        candidates = np.concatenate([self.positions[i] for i in chosen])
+        vectors = _chunk_vectors(vectorstore.index)[candidates]
+
+        dist = ((vectors - q) ** 2).sum(axis=1)
+        top = min(k, len(candidates))
+        best = np.argpartition(dist, top - 1)[:top]
+        best = best[np.argsort(dist[best])]
+
+        return [
+            vectorstore.index_to_docstore_id[int(candidates[i])]
+            for i in best
+        ]
@@ -1,65 +1,105 @@
 import os
+import shutil
+import tempfile
 import git
 from repo_index import build_repo_manifest
+from utils.repo_id import get_repo_id
 
 SUPPORTED_EXT = [".py", ".md", ".txt"]
 
-def clone_repo(repo_url: str, target_dir="repos"):
-    os.makedirs(target_dir, exist_ok=True)
-    repo_name = repo_url.split("/")[-1].replace(".git", "")
-    repo_path = os.path.join(target_dir, repo_name)
+# Checkouts live in <REPO_CHECKOUT_DIR>/<repo_id>/<commit>
+REPO_CHECKOUT_DIR = "repos"
 
-    if not os.path.exists(repo_path):
-        git.Repo.clone_from(repo_url, repo_path)
+
+def repo_checkout_root(repo_id: str, target_dir: str = REPO_CHECKOUT_DIR) -> str:
+    return os.path.join(target_dir, repo_id)
+
+
+def _clone_fresh(clone_url: str, repo_id: str, target_dir: str) -> str:
+    """
+    Clones into a new temp directory under the repo's own root, then
+    moves it to <repo_id>/<commit>. Existing checkouts (which a live
+    index may be reading) are never modified or removed here.
+    """
+    root = repo_checkout_root(repo_id, target_dir)
+    os.makedirs(root, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=".clone-", dir=root)
+
+    try:
+        git.Repo.clone_from(clone_url, tmp_path)
+        commit = get_repo_commit(tmp_path)
+        repo_path = os.path.join(root, commit or os.path.basename(tmp_path).lstrip("."))
+
+        if os.path.isdir(repo_path):
+            # Same commit already checked out: its content is identical
+            shutil.rmtree(tmp_path)
+        else:
+            os.replace(tmp_path, repo_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
 
     return repo_path
 
 
-def read_repo_files(repo_path: str):
-    documents = []
+def clone_repo(repo_url: str, target_dir=REPO_CHECKOUT_DIR, repo_id: str | None = None):
+    return _clone_fresh(repo_url, repo_id or get_repo_id(repo_url), target_dir)
 
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if any(file.endswith(ext) for ext in SUPPORTED_EXT):
-                full_path = os.path.join(root, file)
-                try:
-                    with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
 
-                    documents.append({
-                        "text": content,
-                        "metadata": {
-                            "file": os.path.relpath(full_path, repo_path)
-                        }
-                    })
-                except:
-                    pass
+def get_repo_commit(repo_path: str):
+    """
+    HEAD commit sha of a checkout (None if unavailable).
+    """
+    try:
+        return git.Repo(repo_path).head.commit.hexsha
+    except Exception:
+        return None
+
+
+def read_repo_files(repo_path: str, symbols=None):
+    # One pass: the manifest walk reads each supported file once and
+    # hands its text back for the documents
+    texts = {}
+    manifest = build_repo_manifest(
+        repo_path,
+        symbols=symbols,
+        texts=texts,
+        text_exts=SUPPORTED_EXT,
+    )
+
+    documents = [
+        {
+            "text": content,
+            "metadata": {
+                "file": path
+            }
+        }
+        for path, content in texts.items()
+    ]
 
-    manifest = build_repo_manifest(repo_path)
     return documents, manifest
 
-def clone_private_repo(repo_url: str, github_token: str, target_dir="repos"):
+def clone_private_repo(
+    repo_url: str,
+    github_token: str,
+    target_dir=REPO_CHECKOUT_DIR,
+    repo_id: str | None = None,
+):
     """
     Clone a private GitHub repo using a per-request token.
     Token is NOT stored.
+    Always a fresh clone, next to (never over) the live checkout.
     """
-    os.makedirs(target_dir, exist_ok=True)
-
-    repo_name = repo_url.split("/")[-1].replace(".git", "")
-    repo_path = os.path.join(target_dir, repo_name)
-
     # Inject token into clone URL
     auth_url = repo_url.replace(
         "https://",
         f"https://{github_token}@"
     )
 
-    # Always replace repo (as per your requirement)
-    if os.path.exists(repo_path):
-        import shutil
-        shutil.rmtree(repo_path)
+    repo_path = _clone_fresh(auth_url, repo_id or get_repo_id(repo_url), target_dir)
 
-    git.Repo.clone_from(auth_url, repo_path)
+    # Don't leave the token in the checkout's git config
+    git.Repo(repo_path).remotes.origin.set_url(repo_url)
 
     return repo_path
 
@@ -0,0 +1,193 @@
+# llm_scheduler.py
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Upstream LLM calls in flight, across all tenants
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# In-flight calls per api_key_id (a burst can't take every slot)
+LLM_TENANT_CONCURRENCY = int(os.getenv("LLM_TENANT_CONCURRENCY", "2"))
+
+# Calls per api_key_id allowed to wait; beyond that /chat answers
+# "busy" at once. Waiters park a worker thread, so both this and the
+# timeout stay small: a bursting key can't drain the threadpool.
+LLM_TENANT_MAX_QUEUED = int(os.getenv("LLM_TENANT_MAX_QUEUED", "2"))
+
+# Seconds a call may wait for a slot before giving up
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+
+# Queue-wait samples kept for percentiles
+WAIT_SAMPLES = 1024
+
+# Idle tenants' finish tags are forgotten past this many
+MAX_TRACKED_TENANTS = 10000
+
+
+class _Ticket:
+    __slots__ = ("tenant", "start", "finish", "prev_finish", "granted", "enqueued_at")
+
+    def __init__(self, tenant: str, start: float, finish: float, prev_finish: float | None):
+        self.tenant = tenant
+        self.start = start
+        self.finish = finish
+        # Tenant's finish tag before this ticket (None: had none)
+        self.prev_finish = prev_finish
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    """
+    Admission control for LLM calls: a global concurrency cap, a
+    per-tenant cap, and weighted fair queuing between tenants.
+
+    Each waiting call starts at max(virtual_time, tenant's last finish
+    tag) and finishes 1 / weight later; a free slot
+    goes to the smallest tag among tenants under their cap. A tenant
+    with a deep backlog therefore only delays others by its fair share.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        tenant_concurrency: int = LLM_TENANT_CONCURRENCY,
+        tenant_max_queued: int = LLM_TENANT_MAX_QUEUED,
+    ):
+        self.max_concurrency = max_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.tenant_max_queued = tenant_max_queued
+
+        self._cond = threading.Condition()
+        self._queues = {}
+        self._running = 0
+        self._tenant_running = {}
+        self._last_finish = {}
+        self._virtual_time = 0.0
+
+        self._waits_ms = deque(maxlen=WAIT_SAMPLES)
+        self._admitted = 0
+        self._timeouts = 0
+        self._rejected = 0
+
+    @contextmanager
+    def slot(self, tenant: str | None, weight: float = 1.0, timeout: float = LLM_QUEUE_TIMEOUT):
+        """
+        with LLM_SCHEDULER.slot(api_key_id): llm.invoke(...)
+        Raises TimeoutError when no slot frees up within timeout, or
+        at once when the tenant already has tenant_max_queued waiting.
+        """
+        ticket = self._acquire(tenant or "anonymous", weight, timeout)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def _acquire(self, tenant: str, weight: float, timeout: float) -> _Ticket:
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            if len(self._queues.get(tenant, ())) >= self.tenant_max_queued:
+                self._rejected += 1
+                raise TimeoutError("LLM queue full")
+
+            prev_finish = self._last_finish.get(tenant)
+            start = max(self._virtual_time, prev_finish or 0.0)
+            ticket = _Ticket(tenant, start, start + 1.0 / max(weight, 1e-6), prev_finish)
+            self._last_finish[tenant] = ticket.finish
+            self._queues.setdefault(tenant, deque()).append(ticket)
+
+            self._dispatch()
+
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queues[tenant].remove(ticket)
+                    if not self._queues[tenant]:
+                        del self._queues[tenant]
+                    # A call that never ran mustn't push back the tenant's
+                    # next one (unless a later ticket already chained on it)
+                    if self._last_finish.get(tenant) == ticket.finish:
+                        if ticket.prev_finish is None:
+                            del self._last_finish[tenant]
+                        else:
+                            self._last_finish[tenant] = ticket.prev_finish
+                    self._timeouts += 1
+                    raise TimeoutError("LLM queue timeout")
+                self._cond.wait(remaining)
+
+            self._waits_ms.append((time.monotonic() - ticket.enqueued_at) * 1000)
+            self._admitted += 1
+            return ticket
+
+    def _release(self, ticket: _Ticket):
+        with self._cond:
+            self._running -= 1
+            self._tenant_running[ticket.tenant] -= 1
+            if not self._tenant_running[ticket.tenant]:
+                del self._tenant_running[ticket.tenant]
+
+            if len(self._last_finish) > MAX_TRACKED_TENANTS:
+                # A tag behind virtual time is the same as no tag
+                self._last_finish = {
+                    t: f for t, f in self._last_finish.items()
+                    if f > self._virtual_time or t in self._queues
+                }
+
+            self._dispatch()
+
+    def _dispatch(self):
+        """
+        Grant free slots by smallest finish tag (caller holds the lock).
+        """
+        granted = False
+
+        while self._running < self.max_concurrency:
+            eligible = [
+                queue[0]
+                for tenant, queue in self._queues.items()
+                if self._tenant_running.get(tenant, 0) < self.tenant_concurrency
+            ]
+            if not eligible:
+                break
+
+            ticket = min(eligible, key=lambda t: t.finish)
+            queue = self._queues[ticket.tenant]
+            queue.popleft()
+            if not queue:
+                del self._queues[ticket.tenant]
+
+            ticket.granted = True
+            # Virtual time follows the start tag of the last admitted call
+            self._virtual_time = max(self._virtual_time, ticket.start)
+            self._running += 1
+            self._tenant_running[ticket.tenant] = self._tenant_running.get(ticket.tenant, 0) + 1
+            granted = True
+
+        if granted:
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits_ms)
+            return {
+                "running": self._running,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "tenants_waiting": len(self._queues),
+                "admitted": self._admitted,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "max_concurrency": self.max_concurrency,
+                "tenant_concurrency": self.tenant_concurrency,
+                "tenant_max_queued": self.tenant_max_queued,
+                "queue_wait_ms": {
+                    "p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                    "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else 0.0,
+                    "max": round(waits[-1], 2) if waits else 0.0,
+                },
+            }
+
+
+LLM_SCHEDULER = LLMScheduler()
@@ -1,23 +1,36 @@
 # main.py
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
 import uuid
 
-from ingest import clone_repo, read_repo_files
-from embed import create_vector_store
+from ingest import clone_repo
 from rag import ask_question
+from llm_scheduler import LLM_SCHEDULER
 from router import route_question
 from followups import generate_followups
 from auth.dependency import verify_api_key
+from auth.rate_limit import rate_limit_by_client
+from auth.logger import USAGE_LOG
 from middleware.request_logger import RequestLoggingMiddleware
 from memory import clear_all_conversations
+from answer_cache import answer_cache_stats
+from retrieval import retrieval_cache_stats
+from repo_registry import get_index, index_repo as build_and_publish_index, repo_write_lock
+from repo_metadata import (
+    RepoRecord,
+    get_repo,
+    remember_repo,
+    repo_metadata_stats,
+    update_repo,
+)
 from ingest import clone_private_repo
 
 from auth.api_key import generate_api_key, hash_api_key
-from supabase import create_client
+from utils.db import get_supabase, query_metrics
 
 
 from datetime import datetime, timezone
@@ -28,11 +41,28 @@ from chat_store import (
     delete_chat,
 )
 from utils.repo_id import get_repo_id
+from utils.singleflight import SingleFlight
+from structural_query import answer_structural
+from summaries import render_directory_summaries
+from file_content import (
+    FILE_STREAM_THRESHOLD,
+    iter_file_bytes,
+    parse_range,
+    read_capped,
+    read_lines,
+    valid_line_range,
+)
 
 from auth.api_key_service import create_api_key_internal
 from auth.api_key_service import list_api_keys_internal
 from auth.api_key_service import update_api_key_internal
 from auth.api_key_service import revoke_api_key_internal
+from auth.api_key_service import (
+    USAGE_LOG_PAGE_SIZE,
+    usage_logs_page_internal,
+    usage_summary_internal,
+)
+from auth.key_cache import api_key_cache_stats, invalidate_api_key
 
 from fastapi import BackgroundTasks
 
@@ -45,9 +75,15 @@ load_dotenv()
 app = FastAPI(title="RepoLens Backend")
 app.add_middleware(RequestLoggingMiddleware)
 
-VECTOR_STORE = {}
-REPO_MANIFEST = None
-REPO_PATH = None
+# Per-repo index handles (path + manifest + vectors) live in repo_registry
+
+# repo_id -> in-flight vector store rehydration
+REHYDRATION = SingleFlight()
+REHYDRATION_TIMEOUT = float(os.getenv("REHYDRATION_TIMEOUT", "20"))
+REHYDRATION_RETRY_AFTER = int(os.getenv("REHYDRATION_RETRY_AFTER", "10"))
+
+# Suggested retry when the LLM scheduler queue times out
+LLM_BUSY_RETRY_AFTER = int(os.getenv("LLM_BUSY_RETRY_AFTER", "5"))
 
 
 # ------------------ MODELS ------------------
@@ -118,27 +154,27 @@ class RegisterRepoRequest(BaseModel):
 
 # ------------------ HELPERS ------------------
 
-def format_folder_structure(manifest: dict) -> str:
-    lines = []
-    for folder, files in manifest.get("structure", {}).items():
-        if folder.startswith(".git"):
-            continue
-        folder_name = "repo" if folder == "." else folder
-        lines.append(f"{folder_name}/")
-        for f in files:
-            lines.append(f"  ├─ {f}")
-    return "\n".join(lines)
-
-
-def read_file_content(repo_path: str, filename: str) -> str:
-    for root, _, files in os.walk(repo_path):
-        if filename in files:
-            try:
-                with open(os.path.join(root, filename), "r", encoding="utf-8", errors="ignore") as f:
-                    return f.read()
-            except Exception:
-                return "❌ Unable to read file."
-    return "❌ File not found."
+def read_file_content(index, filename: str) -> str:
+    """
+    Path-index lookup (full path, partial path or basename).
+    Ambiguous basenames list the candidates instead of guessing.
+    """
+    path, candidates = index.path_index.resolve(filename)
+
+    if path is None:
+        if candidates:
+            return (
+                f"❌ Multiple files named {filename}: "
+                + ", ".join(candidates)
+                + ". Please specify the full path."
+            )
+        return "❌ File not found."
+
+    try:
+        # Capped so huge files don't blow up the chat answer
+        return read_capped(os.path.join(index.repo_path, path))
+    except Exception:
+        return "❌ Unable to read file."
 
 
 def is_greeting(question: str) -> bool:
@@ -157,28 +193,51 @@ def is_last_question_query(text: str) -> bool:
         "what was my last"
     ])
 
+def _rehydrate_index(repo_id: str, repo_url: str):
+    """
+    Rebuild a repo's index after a restart (same logic as indexing).
+    Runs under REHYDRATION, so only one loader per repo at a time.
+    """
+    with repo_write_lock(repo_id):
+        # A previous flight (or an indexing run) may have finished
+        # since the caller's miss
+        index = get_index(repo_id)
+        if index is not None and index.vector_store is not None:
+            return index
+
+        # Reuse the registered checkout when it is still on disk
+        if index is not None and os.path.isdir(index.repo_path):
+            repo_path = index.repo_path
+        else:
+            repo_path = clone_repo(repo_url, repo_id=repo_id)
+
+        return build_and_publish_index(repo_id, repo_path)
+
 def _index_repo_background(repo_id: str, repo_url: str):
     """
     Background task for indexing repository.
-    Reuses existing sync logic without modification.
+    The new index is built off to the side and swapped in atomically;
+    readers keep using the previous snapshot until then.
     """
-    global VECTOR_STORE, REPO_MANIFEST, REPO_PATH
-
-    # Clone repo
-    REPO_PATH = clone_repo(repo_url)
 
-    # Read files
-    documents, REPO_MANIFEST = read_repo_files(REPO_PATH)
+    # Clone + build + publish under the repo's writer lock, so a
+    # concurrent run can't prune this checkout before it is built
+    with repo_write_lock(repo_id):
+        # Fresh checkout; the live one is untouched until publish
+        repo_path = clone_repo(repo_url, repo_id=repo_id)
 
-    # Build vector store
-    # VECTOR_STORE = create_vector_store(documents)
-    VECTOR_STORE[repo_id] = create_vector_store(documents)
+        # Read files + build vector store, then publish
+        index = build_and_publish_index(repo_id, repo_path)
 
     # Update indexed_at
+    indexed_at = datetime.utcnow().isoformat() + "Z"
     supabase.table("repos").update({
-        "indexed_at": datetime.utcnow().isoformat() + "Z"
+        "indexed_at": indexed_at
     }).eq("repo_id", repo_id).execute()
 
+    # Keep the /chat guard's cached row in step
+    update_repo(repo_id, indexed_at=indexed_at, commit=index.commit)
+
 
 
 
@@ -192,21 +251,49 @@ def health_check():
     }
 
 
+@app.get("/metrics/cache")
+def cache_metrics():
+    return {
+        **retrieval_cache_stats(),
+        "answers": answer_cache_stats(),
+        "api_keys": api_key_cache_stats(),
+        "repos": repo_metadata_stats(),
+    }
+
+
+@app.get("/metrics/db")
+def db_metrics():
+    return query_metrics()
+
+
+@app.get("/metrics/llm")
+def llm_metrics():
+    return LLM_SCHEDULER.stats()
+
+
+@app.get("/metrics/usage-log")
+def usage_log_metrics():
+    return USAGE_LOG.stats()
+
+
+@app.on_event("shutdown")
+def flush_usage_log():
+    # Don't lose queued usage rows on a clean shutdown
+    USAGE_LOG.close()
+
+
 @app.post("/upload-repo")
 def upload_repo(
     data: RepoRequest,
     api_key_id: str = Depends(verify_api_key),
 ):
-    global VECTOR_STORE, REPO_MANIFEST, REPO_PATH
-
     # Reset all conversations when a new repo is uploaded
     clear_all_conversations()
 
-    REPO_PATH = clone_repo(data.repo_url)
-    documents, REPO_MANIFEST = read_repo_files(REPO_PATH)
-    # VECTOR_STORE = create_vector_store(documents)
     repo_id = get_repo_id(data.repo_url)
-    VECTOR_STORE[repo_id] = create_vector_store(documents)
+    with repo_write_lock(repo_id):
+        repo_path = clone_repo(data.repo_url, repo_id=repo_id)
+        build_and_publish_index(repo_id, repo_path)
 
     return {"status": "Repository indexed successfully"}
 
@@ -222,8 +309,6 @@ def chat(
     api_key_id: str = Depends(RequireChatScopes()),
 ):
 
-    global VECTOR_STORE, REPO_MANIFEST, REPO_PATH
-
     # -----------------------------
     # Chat ID (new + backward compatible)
     # -----------------------------
@@ -234,20 +319,15 @@ def chat(
     # -----------------------------
     # Repo indexed guard (PDF aligned)
     # -----------------------------
-    repo_resp = (
-        supabase
-        .table("repos")
-        .select("indexed_at")
-        .eq("repo_id", data.repo_id)
-        .execute()
-    )
+    # Cached repos row (repo_metadata.py): no round trip per message
+    repo = get_repo(data.repo_id)
 
-    if not repo_resp.data:
+    if repo is None:
         return {
             "error": "Repository not registered"
         }
 
-    if not repo_resp.data[0].get("indexed_at"):
+    if not repo.indexed_at:
         return {
             "error": "Repository is not indexed yet. Please index it first."
         }
@@ -307,33 +387,32 @@ def chat(
     # -----------------------------
     # Vector store fetch (ROBUST)
     # -----------------------------
-    vector_store = VECTOR_STORE.get(data.repo_id)
+    # One snapshot for the whole request (path, manifest, vectors)
+    index = get_index(data.repo_id)
 
-    if vector_store is None:
+    if index is None or index.vector_store is None:
         # Repo is indexed in DB but vector store not in memory
-        # Rehydrate vector store safely
-        repo_resp = (
-            supabase
-            .table("repos")
-            .select("repo_url")
-            .eq("repo_id", data.repo_id)
-            .execute()
-        )
-
-        if not repo_resp.data:
+        # Rehydrate vector store safely (URL from the cached row above)
+        repo_url = repo.repo_url
+
+        # One loader per repo; concurrent requests wait on it
+        try:
+            index, _ = REHYDRATION.do(
+                data.repo_id,
+                lambda: _rehydrate_index(data.repo_id, repo_url),
+                timeout=REHYDRATION_TIMEOUT,
+                background=True,
+            )
+        except TimeoutError:
             return {
-                "error": "Repository metadata missing."
+                "status": "warming",
+                "error": "Repository is warming up. Please retry shortly.",
+                "retry_after": REHYDRATION_RETRY_AFTER,
+            }
+        except Exception:
+            return {
+                "error": "Failed to load repository vector store."
             }
-
-        repo_url = repo_resp.data[0]["repo_url"]
-
-        # Rebuild vector store (same logic as indexing)
-        repo_path = clone_repo(repo_url)
-        documents, _ = read_repo_files(repo_path)
-        vector_store = create_vector_store(documents)
-
-        # Cache it
-        VECTOR_STORE[data.repo_id] = vector_store
 
 
     # -----------------------------
@@ -357,12 +436,12 @@ def chat(
     #         .execute()
     #     )
 
-    if not repo_resp.data:
+    if repo is None:
         return {
             "error": "Repository not registered"
         }
 
-        if not repo_resp.data[0].get("indexed_at"):
+        if not repo.indexed_at:
             return {
                 "error": "Repository is not indexed yet. Please index it first."
             }
@@ -431,7 +510,17 @@ def chat(
     # STRUCTURAL (UNCHANGED)
     # -----------------------------
     if route == "STRUCTURAL":
-        answer = format_folder_structure(REPO_MANIFEST)
+        # Counts / listings / "where is X defined" without the LLM;
+        # anything else gets the folder structure
+        answer = answer_structural(data.message, index)
+
+        if answer is None:
+            answer = index.tree.text
+            if index.summaries:
+                answer += (
+                    "\n\nDirectory summaries:\n"
+                    + render_directory_summaries(index.summaries)
+                )
 
         append_message(
             chat_id=chat_id,
@@ -460,7 +549,7 @@ def chat(
             answer = "❌ Please specify a file name."
             sources = []
         else:
-            code = read_file_content(REPO_PATH, filename)
+            code = read_file_content(index, filename)
             answer = f"```python\n{code}\n```"
             sources = [filename]
 
@@ -482,12 +571,21 @@ def chat(
     # -----------------------------
     # SEMANTIC (RAG + MEMORY) (FIXED STORE)
     # -----------------------------
-    response = ask_question(
-        vector_store,
-        question=data.message,
-        session_id=conversation_id,
-        context=data.context,
-    )
+    try:
+        response = ask_question(
+            index.vector_store,
+            question=data.message,
+            session_id=conversation_id,
+            context=data.context,
+            index=index,
+            api_key_id=api_key_id,
+        )
+    except TimeoutError:
+        return {
+            "status": "busy",
+            "error": "Too many concurrent requests. Please retry shortly.",
+            "retry_after": LLM_BUSY_RETRY_AFTER,
+        }
 
     append_message(
         chat_id=chat_id,
@@ -502,16 +600,15 @@ def chat(
         "reply": response["answer"],
         "tokens_used": response.get("tokens_used"),
         "sources": response.get("sources", []),
+        "cached": response.get("cached", False),
         "created_at": datetime.utcnow().isoformat() + "Z",
     }
 
 
 
 
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY"),
-)
+# Shared pooled client (utils/db.py)
+supabase = get_supabase()
 
 # @app.post("/generate-key")
 # def generate_keys(data: GenerateKeyRequest):
@@ -573,11 +670,20 @@ def delete_chat_session(
 @app.get("/manage-keys")
 def manage_keys(
     api_key_id: str = Depends(verify_api_key),
+    since: str | None = None,
+    until: str | None = None,
+    key_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = USAGE_LOG_PAGE_SIZE,
 ):
     """
     Return all API keys and usage logs
     scoped to the same user_email as the caller.
     JSON output only.
+
+    Usage counts come from one grouped query; logs are one page per
+    key (newest first). since / until bound both (ISO timestamps);
+    pass key_id + cursor (a key's next_cursor) to fetch its next page.
     """
 
     # 1️⃣ Get caller's user_email
@@ -605,22 +711,32 @@ def manage_keys(
 
     keys = keys_resp.data or []
 
+    if key_id is not None:
+        keys = [k for k in keys if k["id"] == key_id]
+        if not keys:
+            return {"error": "API key not found"}
+
+    # 3️⃣ Usage counts for all keys in one aggregated query
+    usage = usage_summary_internal(
+        key_ids=[k["id"] for k in keys],
+        since=since,
+        until=until,
+    )
+
     result = []
 
-    # 3️⃣ For each key, get logs
+    # 4️⃣ One bounded page of logs per key
     for key in keys:
-        logs_resp = (
-            supabase
-            .table("api_usage_logs")
-            .select(
-                "endpoint, method, status_code, duration_ms, created_at, request_id, error_message"
+        try:
+            page = usage_logs_page_internal(
+                key_id=key["id"],
+                since=since,
+                until=until,
+                cursor=cursor if key_id is not None else None,
+                limit=limit,
             )
-            .eq("api_key_id", key["id"])
-            .order("created_at", desc=True)
-            .execute()
-        )
-
-        logs = logs_resp.data or []
+        except ValueError:
+            return {"error": "Invalid cursor"}
 
         result.append({
             "api_key_id": key["id"],
@@ -628,13 +744,9 @@ def manage_keys(
             "status": key["status"],
             "created_at": key["created_at"],
             "last_used_at": key["last_used_at"],
-            "usage": {
-                "total_requests": len(logs),
-                "error_count": sum(
-                    1 for l in logs if l.get("status_code", 200) >= 400
-                ),
-            },
-            "logs": logs,
+            "usage": usage[key["id"]],
+            "logs": page["logs"],
+            "next_cursor": page["next_cursor"],
         })
 
     return {
@@ -696,6 +808,8 @@ def revoke_keys(
         "status": "revoked"
     }).eq("id", data.api_key_id).execute()
 
+    invalidate_api_key(data.api_key_id)
+
     return {
         "status": "success",
         "message": "API key revoked successfully",
@@ -745,29 +859,28 @@ def private_repo_access(
     Replaces the currently indexed repository.
     """
 
-    global VECTOR_STORE, REPO_MANIFEST, REPO_PATH
-
     if not data.repo_url or not data.github_token:
         return {"error": "repo_url and github_token are required"}
 
     clear_all_conversations()
 
-    try:
-        REPO_PATH = clone_private_repo(
-            data.repo_url,
-            data.github_token
-        )
-    except Exception as e:
-        return {
-            "error": "Failed to access private repository",
-            "details": str(e)
-        }
-
-    documents, REPO_MANIFEST = read_repo_files(REPO_PATH)
-    # VECTOR_STORE = create_vector_store(documents)
     repo_id = get_repo_id(data.repo_url)
-    VECTOR_STORE[repo_id] = create_vector_store(documents)
 
+    # Clone through publish under the repo's writer lock
+    with repo_write_lock(repo_id):
+        try:
+            repo_path = clone_private_repo(
+                data.repo_url,
+                data.github_token,
+                repo_id=repo_id,
+            )
+        except Exception as e:
+            return {
+                "error": "Failed to access private repository",
+                "details": str(e)
+            }
+
+        build_and_publish_index(repo_id, repo_path)
 
     return {
         "status": "Private repository indexed successfully"
@@ -1030,31 +1143,35 @@ def register_repo(data: RegisterRepoRequest):
         "credential_id": data.credential_id, 
     }).execute()
 
+    remember_repo(RepoRecord(
+        repo_id=repo_id,
+        repo_url=data.repo_url,
+        credential_id=data.credential_id,
+    ))
+
     return {
         "repo_id": repo_id,
         "status": "registered",
     }
 
 @app.post("/repos/{repo_id}/index")
-def index_repo(repo_id: str, background_tasks: BackgroundTasks):
+def index_repo(
+    repo_id: str,
+    background_tasks: BackgroundTasks,
+    _: None = Depends(rate_limit_by_client),
+):
     """
     Starts async repository indexing.
     No authentication required.
     """
 
     # 1️⃣ Fetch repo metadata
-    repo_resp = (
-        supabase
-        .table("repos")
-        .select("repo_url")
-        .eq("repo_id", repo_id)
-        .execute()
-    )
+    repo = get_repo(repo_id)
 
-    if not repo_resp.data:
+    if repo is None:
         return {"error": "Repository not registered"}
 
-    repo_url = repo_resp.data[0]["repo_url"]
+    repo_url = repo.repo_url
 
     # 2️⃣ Start background indexing
     background_tasks.add_task(
@@ -1103,62 +1220,156 @@ def repo_status(repo_id: str):
 
 
 @app.get("/repos/{repo_id}/tree")
-def repo_tree(repo_id: str):
-    if REPO_MANIFEST is None:
-        return {"error": "Repository not indexed"}
-
-    tree = []
+def repo_tree(
+    repo_id: str,
+    request: Request,
+    path: str | None = None,
+    cursor: str | None = None,
+    limit: int = 200,
+):
+    """
+    Full tree (pre-serialized at index time), or with ?path=
+    the paginated direct children of one directory ("" = root).
+    Honors If-None-Match against an ETag tied to the indexed commit.
+    """
+    index = get_index(repo_id)
 
-    for folder, files in REPO_MANIFEST.get("structure", {}).items():
+    if index is None:
+        return {"error": "Repository not indexed"}
 
-        # 🚫 Skip .git folder entirely
-        if folder.startswith(".git"):
-            continue
+    tree = index.tree
+    headers = {"ETag": tree.etag, "Cache-Control": "no-cache"}
 
-        folder_path = "" if folder == "." else f"{folder}/"
+    # Resolve ?path= first: an unknown directory is an error, not a 304
+    page = None
+    if path is not None:
+        page = tree.children_page(path, cursor=cursor, limit=limit)
 
-        if folder_path:
-            tree.append({
-                "path": folder_path,
-                "type": "dir"
-            })
+        if page is None:
+            return {"error": "Directory not found"}
 
-        for f in files:
-            # 🚫 Skip .git files just in case
-            if f.startswith(".git"):
-                continue
+    if tree.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
 
-            tree.append({
-                "path": f"{folder_path}{f}",
-                "type": "file"
-            })
+    # Lazy per-directory mode
+    if page is not None:
+        return JSONResponse({"repo_id": repo_id, **page}, headers=headers)
 
-    return {
-        "repo_id": repo_id,
-        "tree": tree
-    }
+    return Response(
+        content=tree.payload,
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 
 @app.get("/repos/{repo_id}/files")
-def repo_file(repo_id: str, path: str):
+def repo_file(
+    repo_id: str,
+    path: str,
+    request: Request,
+    start_line: int | None = None,
+    end_line: int | None = None,
+):
     """
     Get file content from repository.
     Requires repo to be indexed.
     No authentication required.
+
+    - start_line / end_line (1-based, inclusive) return a slice as JSON
+    - an HTTP Range header (bytes=...) returns 206 with the raw bytes
+    - files above FILE_STREAM_THRESHOLD are streamed as text/plain
     """
 
-    if REPO_PATH is None:
+    index = get_index(repo_id)
+
+    if index is None:
         return {"error": "Repository not indexed"}
 
+    file_path, candidates = index.path_index.resolve(path)
+
+    if file_path is None:
+        if candidates:
+            return {
+                "error": "Ambiguous file name",
+                "candidates": candidates,
+            }
+        return {"error": "File not found"}
+
+    full_path = os.path.join(index.repo_path, file_path)
+
+    try:
+        size = os.path.getsize(full_path)
+    except OSError:
+        return {"error": "File not found"}
+
+    # 1️⃣ Byte range (HTTP Range)
+    range_header = request.headers.get("range")
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416,
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+    # Multi-range / unsupported Range headers are ignored (full body)
+    if byte_range is not None:
+        start, end = byte_range
+        return StreamingResponse(
+            iter_file_bytes(full_path, start, end),
+            status_code=206,
+            media_type="application/octet-stream",
+            headers={
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
+                "Accept-Ranges": "bytes",
+            },
+        )
+
+    # 2️⃣ Line range
+    if start_line is not None or end_line is not None:
+        if not valid_line_range(start_line, end_line):
+            return JSONResponse(
+                {"error": "Invalid line range: start_line/end_line must be >= 1 and start_line <= end_line"},
+                status_code=400,
+            )
+
+        try:
+            content = read_lines(full_path, start_line, end_line)
+        except OSError:
+            return {"error": "File not found"}
+
+        return {
+            "repo_id": repo_id,
+            "path": file_path,
+            "start_line": start_line or 1,
+            "end_line": end_line,
+            "content": content
+        }
+
+    # 3️⃣ Large file → stream instead of one JSON string
+    if size > FILE_STREAM_THRESHOLD:
+        return StreamingResponse(
+            iter_file_bytes(full_path),
+            media_type="text/plain; charset=utf-8",
+            headers={
+                "Content-Length": str(size),
+                "Accept-Ranges": "bytes",
+            },
+        )
+
     try:
-        content = read_file_content(REPO_PATH, path)
+        with open(full_path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
     except Exception:
         return {"error": "File not found"}
 
     return {
         "repo_id": repo_id,
-        "path": path,
+        "path": file_path,
         "content": content
     }
 
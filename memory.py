@@ -15,6 +15,8 @@
 
 # memory.py
 
+import hashlib
+
 from langchain_core.chat_history import InMemoryChatMessageHistory
 
 # In-memory store for all conversations
@@ -37,3 +39,17 @@ def clear_all_conversations():
     Used when a new repo is uploaded to avoid context bleed.
     """
     _STORE.clear()
+
+
+def history_fingerprint(history: InMemoryChatMessageHistory) -> str:
+    """
+    Stable digest of a conversation's messages.
+    Two sessions with identical history share the same fingerprint.
+    """
+    digest = hashlib.sha1()
+    for m in history.messages:
+        digest.update(m.type.encode())
+        digest.update(b"\0")
+        digest.update(str(m.content).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
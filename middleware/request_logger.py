@@ -1,52 +1,62 @@
 # middleware/request_logger.py
 import time
 import uuid
-import os
-from supabase import create_client
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
-from dotenv import load_dotenv
 
-load_dotenv()
+from auth.logger import log_usage_event
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+class RequestLoggingMiddleware:
+    """
+    Pure ASGI middleware: one usage row per HTTP request.
+    Doesn't wrap or buffer the body, so streaming / Range responses
+    pass straight through; the row is handed to the write-behind queue
+    (auth/logger.py) without blocking the event loop.
+    """
 
+    def __init__(self, app):
+        self.app = app
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.monotonic()
         request_id = str(uuid.uuid4())
 
-        response = None
+        # Shared with request.state, where verify_api_key puts api_key_id
+        scope.setdefault("state", {})
+
+        status_code = 500
         error_message = None
 
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
         try:
-            response = await call_next(request)
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
+            status_code = 500
             error_message = str(e)
             raise
         finally:
-            duration_ms = int((time.time() - start_time) * 1000)
-
-            # api_key_id is injected by verify_api_key dependency
-            api_key_id = getattr(request.state, "api_key_id", None)
-
-            try:
-                supabase.table("api_usage_logs").insert({
-                    "request_id": request_id,
-                    "api_key_id": api_key_id,
-                    "endpoint": request.url.path,
-                    "method": request.method,
-                    "status_code": response.status_code if response else 500,
-                    "duration_ms": duration_ms,
-                    "error_message": error_message,
-                }).execute()
-            except Exception:
-                # IMPORTANT: logging must never break the app
-                pass
-
-
+            duration_ms = int((time.monotonic() - start_time) * 1000)
+
+            state = scope["state"]
+            if isinstance(state, dict):
+                api_key_id = state.get("api_key_id")
+            else:
+                api_key_id = getattr(state, "api_key_id", None)
+
+            await log_usage_event(
+                request_id=request_id,
+                api_key_id=api_key_id,
+                endpoint=scope["path"],
+                method=scope["method"],
+                status_code=status_code,
+                duration_ms=duration_ms,
+                error_message=error_message,
+            )
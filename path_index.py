@@ -0,0 +1,58 @@
+# path_index.py
+
+
+def normalize_path(path: str) -> str:
+    path = path.strip().replace("\\", "/")
+    while path.startswith("./"):
+        path = path[2:]
+    return path.lstrip("/")
+
+
+class PathIndex:
+    """
+    O(1) file lookups over a repo manifest.
+    Maps full relative paths and basenames to manifest file entries
+    (path, size, hash), built once per index.
+    """
+
+    def __init__(self, files: list[dict]):
+        self.by_path = {}
+        self.by_name = {}
+
+        for entry in files:
+            path = normalize_path(entry["path"])
+            self.by_path[path] = entry
+            self.by_name.setdefault(path.rsplit("/", 1)[-1], []).append(path)
+
+    @classmethod
+    def from_manifest(cls, manifest: dict) -> "PathIndex":
+        return cls(manifest.get("files", []))
+
+    def resolve(self, name: str):
+        """
+        Returns (path, candidates).
+        path is the unique match (or None); candidates lists
+        every matching path when the name is ambiguous.
+        """
+        name = normalize_path(name)
+
+        if name in self.by_path:
+            return name, [name]
+
+        basename = name.rsplit("/", 1)[-1]
+        candidates = self.by_name.get(basename, [])
+
+        # Partial paths ("auth/logger.py") narrow basename matches
+        if "/" in name:
+            candidates = [p for p in candidates if p.endswith("/" + name)]
+
+        if len(candidates) == 1:
+            return candidates[0], candidates
+
+        return None, candidates
+
+    def get(self, path: str) -> dict | None:
+        return self.by_path.get(normalize_path(path))
+
+    def __len__(self):
+        return len(self.by_path)
@@ -55,7 +55,13 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-from memory import get_session_history
+from memory import get_session_history, history_fingerprint
+from embed import embed_query
+from answer_cache import lookup_answer, lookup_exact, normalize_question, store_answer
+from retrieval import retrieve
+from utils.singleflight import SingleFlight
+from summaries import is_overview_question, render_overview_context
+from llm_scheduler import LLM_SCHEDULER
 
 load_dotenv()
 
@@ -80,21 +86,107 @@ with_history = RunnableWithMessageHistory(
     history_messages_key="history",
 )
 
+# Identical concurrent questions share one retrieval + LLM call
+_IN_FLIGHT = SingleFlight()
 
-def ask_question(vectorstore, question: str, session_id: str, context=None):
+
+def ask_question(
+    vectorstore,
+    question: str,
+    session_id: str,
+    context=None,
+    index=None,
+    api_key_id: str | None = None,
+):
     """
     session_id is treated as conversation_id.
     No RAG logic is changed.
-    """
-    docs = vectorstore.similarity_search(question, k=20)
-    context = "\n\n".join(doc.page_content for doc in docs)
 
-    combined_input = f"{question}\n\nRepository Context:\n{context}"
+    When a RepoIndex is given, standalone questions (empty history)
+    go through the answer cache keyed by (repo_id, commit), and
+    concurrent identical requests are coalesced into one computation.
 
-    result = with_history.invoke(
-        {"input": combined_input},
-        config={"configurable": {"session_id": session_id}}
+    api_key_id is the tenant for LLM scheduling (llm_scheduler.py);
+    raises TimeoutError when no LLM slot frees up in time.
+    """
+    if index is None:
+        return _answer_question(vectorstore, question, session_id, api_key_id=api_key_id)
+
+    history = get_session_history(session_id)
+    key = (
+        index.repo_id,
+        index.commit,
+        normalize_question(question),
+        history_fingerprint(history),
     )
 
+    (leader_session_id, response), shared = _IN_FLIGHT.do(
+        key,
+        lambda: (
+            session_id,
+            _answer_question(vectorstore, question, session_id, index, api_key_id),
+        ),
+    )
+
+    if shared and leader_session_id != session_id:
+        # Only the leader's conversation was written; mirror the turn here
+        history.add_user_message(question)
+        history.add_ai_message(response["answer"])
+
+    return response
+
+
+def _answer_question(
+    vectorstore,
+    question: str,
+    session_id: str,
+    index=None,
+    api_key_id: str | None = None,
+):
+    """
+    Follow-up turns are never cached: their answer depends on history.
+    """
+    history = get_session_history(session_id)
+    cacheable = index is not None and not history.messages
+    query_embedding = None
+
+    if cacheable:
+        # Exact repeat first: no embedding needed for the common hit
+        cached = lookup_exact(index.repo_id, index.commit, question)
+
+        if cached is None:
+            query_embedding = embed_query(question)
+            cached = lookup_answer(index.repo_id, index.commit, question, query_embedding)
+
+        if cached is not None:
+            # Keep conversation memory coherent for the next turn
+            history.add_user_message(question)
+            history.add_ai_message(cached["answer"])
+            return {**cached, "cached": True}
+
+    if index is not None and index.summaries and is_overview_question(question):
+        # Overview questions: compact precomputed summaries, not raw chunks
+        context = render_overview_context(index.summaries)
+        combined_input = f"{question}\n\nRepository Summaries:\n{context}"
+    else:
+        docs = retrieve(vectorstore, question, k=20, index=index)
+        context = "\n\n".join(doc.page_content for doc in docs)
+
+        combined_input = f"{question}\n\nRepository Context:\n{context}"
+
+    # Global + per-tenant concurrency caps, fair between tenants
+    with LLM_SCHEDULER.slot(api_key_id):
+        result = with_history.invoke(
+            {"input": combined_input},
+            config={"configurable": {"session_id": session_id}}
+        )
+
     answer = result.content
-    return {"answer": answer, "follow_ups": []}
+    response = {"answer": answer, "follow_ups": []}
+
+    if cacheable:
+        store_answer(
+            index.repo_id, index.commit, question, response, query_embedding
+        )
+
+    return {**response, "cached": False}
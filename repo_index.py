@@ -1,16 +1,43 @@
+import hashlib
 import os
-import re
 
-PY_FUNC_RE = re.compile(r"^def\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(", re.MULTILINE)
-PY_CLASS_RE = re.compile(r"^class\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*", re.MULTILINE)
+from symbol_index import extract_symbols, supports
 
-def build_repo_manifest(repo_path: str):
+SKIP_DIRS = {".git"}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path: str) -> tuple[int, str]:
+    """
+    (size, sha1) read in chunks, so large / binary files the index
+    never parses don't sit in memory whole.
+    """
+    digest = hashlib.sha1()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+def build_repo_manifest(repo_path: str, symbols=None, texts=None, text_exts=()):
+    """
+    symbols: optional SymbolIndex, filled from the same parse
+    that produces each entry's functions / classes.
+    texts: optional dict filled with {path: text} for files ending in
+    text_exts, from the same read (so callers don't read them again).
+    """
     manifest = {
         "files": [],
         "structure": {}
     }
 
-    for root, _, files in os.walk(repo_path):
+    for root, dirs, files in os.walk(repo_path):
+        # Never descend into git internals
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+
         rel_dir = os.path.relpath(root, repo_path)
         manifest["structure"].setdefault(rel_dir, [])
 
@@ -20,18 +47,40 @@ def build_repo_manifest(repo_path: str):
 
             entry = {
                 "path": os.path.relpath(file_path, repo_path),
+                "size": None,
+                "hash": None,
                 "functions": [],
                 "classes": []
             }
 
-            if file.endswith(".py"):
-                try:
-                    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                        entry["functions"] = PY_FUNC_RE.findall(content)
-                        entry["classes"] = PY_CLASS_RE.findall(content)
-                except:
-                    pass
+            parse = supports(file)
+            keep_text = texts is not None and file.endswith(tuple(text_exts))
+
+            raw = None
+            try:
+                if parse or keep_text:
+                    with open(file_path, "rb") as f:
+                        raw = f.read()
+                    entry["size"] = len(raw)
+                    entry["hash"] = hashlib.sha1(raw).hexdigest()
+                else:
+                    entry["size"], entry["hash"] = _hash_file(file_path)
+            except:
+                raw = None
+
+            text = raw.decode("utf-8", errors="ignore") if raw is not None else None
+
+            if keep_text and text is not None:
+                # Same newlines as a text-mode read
+                texts[entry["path"]] = text.replace("\r\n", "\n").replace("\r", "\n")
+
+            if parse and text is not None:
+                found = extract_symbols(file, text)
+                entry["functions"] = [q for k, q, _, _ in found if k != "class"]
+                entry["classes"] = [q for k, q, _, _ in found if k == "class"]
+
+                if symbols is not None:
+                    symbols.add_file(entry["path"], found)
 
             manifest["files"].append(entry)
 
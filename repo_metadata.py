@@ -0,0 +1,76 @@
+# repo_metadata.py
+import os
+from dataclasses import dataclass, replace
+
+from utils.cache import TTLCache
+from utils.db import get_supabase
+
+# Rows of the repos table, cached so /chat doesn't query them per message.
+# Changes made in this process update the cache directly; the TTL
+# bounds staleness for changes made elsewhere (other workers, the DB).
+REPO_METADATA_TTL = float(os.getenv("REPO_METADATA_TTL", "60"))
+REPO_METADATA_CACHE_SIZE = int(os.getenv("REPO_METADATA_CACHE_SIZE", "4096"))
+
+_REPOS = TTLCache(maxsize=REPO_METADATA_CACHE_SIZE, ttl=REPO_METADATA_TTL)
+
+supabase = get_supabase()
+
+
+@dataclass(frozen=True)
+class RepoRecord:
+    repo_id: str
+    repo_url: str
+    indexed_at: str | None = None
+    # Only known once this process has indexed / loaded the repo
+    commit: str | None = None
+    credential_id: str | None = None
+
+
+def get_repo(repo_id: str) -> RepoRecord | None:
+    """
+    Cached repos row; None when the repo isn't registered
+    (misses are not cached, so a new registration shows up at once).
+    """
+    record = _REPOS.get(repo_id)
+    if record is not None:
+        return record
+
+    resp = (
+        supabase
+        .table("repos")
+        .select("repo_id, repo_url, indexed_at, credential_id")
+        .eq("repo_id", repo_id)
+        .execute()
+    )
+
+    if not resp.data:
+        return None
+
+    row = resp.data[0]
+    record = RepoRecord(
+        repo_id=repo_id,
+        repo_url=row["repo_url"],
+        indexed_at=row.get("indexed_at"),
+        credential_id=row.get("credential_id"),
+    )
+    _REPOS.set(repo_id, record)
+    return record
+
+
+def remember_repo(record: RepoRecord):
+    _REPOS.set(record.repo_id, record)
+
+
+def update_repo(repo_id: str, **fields):
+    """
+    Refresh a cached record after this process changed the row
+    (e.g. the indexing pipeline setting indexed_at / commit).
+    Uncached repos are simply loaded on next use.
+    """
+    record = _REPOS.get(repo_id)
+    if record is not None:
+        _REPOS.set(repo_id, replace(record, **fields))
+
+
+def repo_metadata_stats() -> dict:
+    return _REPOS.stats()
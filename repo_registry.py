@@ -0,0 +1,235 @@
+# repo_registry.py
+import json
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+
+from ingest import read_repo_files, get_repo_commit, repo_checkout_root
+from embed import create_vector_store
+from answer_cache import invalidate_repo
+from retrieval import (
+    invalidate_retrieval,
+    build_definition_chunks,
+    build_symbol_chunk_map,
+)
+from code_graph import CodeGraph
+from hierarchical_index import FileLevelIndex
+from summaries import REPO_SUMMARIES, build_summaries, load_summaries, save_summaries
+from path_index import PathIndex
+from repo_tree import RepoTree
+from symbol_index import SymbolIndex
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RepoIndex:
+    """
+    Immutable snapshot of one indexed repo.
+    Readers grab the handle once and use it for the whole request,
+    so they never mix the path of one index with the manifest of another.
+
+    vector_store is None for handles lazily loaded from disk
+    (checkout + manifest only) until the vectors are rehydrated.
+    """
+    repo_id: str
+    repo_path: str
+    manifest: dict
+    vector_store: object = None
+    commit: str | None = None
+    path_index: PathIndex | None = None
+    tree: RepoTree | None = None
+    symbols: SymbolIndex | None = None
+    symbol_chunks: dict | None = None
+    definition_chunks: dict | None = None
+    graph: CodeGraph | None = None
+    file_index: FileLevelIndex | None = None
+    summaries: dict | None = None
+
+
+# Persistent per-repo checkout location + manifest
+REPO_INDEX_DIR = os.getenv("REPO_INDEX_DIR", os.path.join("repos", ".index"))
+
+
+# repo_id -> RepoIndex (replaced wholesale, never mutated)
+_INDEXES: dict[str, RepoIndex] = {}
+
+# Serializes writers per repo; readers never take these
+_WRITE_LOCKS: dict[str, threading.RLock] = {}
+_WRITE_LOCKS_GUARD = threading.Lock()
+
+
+def repo_write_lock(repo_id: str) -> threading.RLock:
+    """
+    Per-repo writer lock. Callers hold it from clone through publish,
+    so one run's publish can't prune a checkout another run is still
+    building. Reentrant: index_repo takes it again.
+    """
+    with _WRITE_LOCKS_GUARD:
+        return _WRITE_LOCKS.setdefault(repo_id, threading.RLock())
+
+
+def get_index(repo_id: str, load: bool = True) -> RepoIndex | None:
+    """
+    Current handle for a repo. On a miss, the checkout location and
+    manifest are lazily loaded from REPO_INDEX_DIR (no vectors).
+    """
+    index = _INDEXES.get(repo_id)
+    if index is None and load:
+        index = _load_checkout(repo_id)
+        if index is not None:
+            # Never clobber a full index published meanwhile
+            index = _INDEXES.setdefault(repo_id, index)
+    return index
+
+
+def _checkout_file(repo_id: str) -> str:
+    return os.path.join(REPO_INDEX_DIR, f"{repo_id}.json")
+
+
+def _symbols_file(repo_id: str, commit: str | None) -> str:
+    # Symbol indexes are kept per commit
+    return os.path.join(REPO_INDEX_DIR, f"{repo_id}.symbols.{commit or 'head'}.json")
+
+
+def _summaries_file(repo_id: str, commit: str | None) -> str | None:
+    # Summaries are generated once per commit; without a commit there's
+    # nothing to key them by ('head' would match any later checkout)
+    if not commit:
+        return None
+    return os.path.join(REPO_INDEX_DIR, f"{repo_id}.summaries.{commit}.json")
+
+
+def _save_checkout(index: RepoIndex):
+    os.makedirs(REPO_INDEX_DIR, exist_ok=True)
+    path = _checkout_file(index.repo_id)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "repo_id": index.repo_id,
+            "repo_path": index.repo_path,
+            "commit": index.commit,
+            "manifest": index.manifest,
+        }, f)
+
+    os.replace(tmp_path, path)
+
+
+def _load_checkout(repo_id: str) -> RepoIndex | None:
+    try:
+        with open(_checkout_file(repo_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # Checkout was removed from disk since it was indexed
+    if not os.path.isdir(data["repo_path"]):
+        return None
+
+    commit = data.get("commit")
+
+    return RepoIndex(
+        repo_id=repo_id,
+        repo_path=data["repo_path"],
+        manifest=data["manifest"],
+        commit=commit,
+        symbols=SymbolIndex.load(_symbols_file(repo_id, commit)),
+        summaries=_load_cached_summaries(repo_id, commit),
+        path_index=PathIndex.from_manifest(data["manifest"]),
+        tree=RepoTree(repo_id, data["manifest"], commit),
+    )
+
+
+def _load_cached_summaries(repo_id: str, commit: str | None) -> dict | None:
+    path = _summaries_file(repo_id, commit)
+    return load_summaries(path) if path else None
+
+
+def build_index(repo_id: str, repo_path: str) -> RepoIndex:
+    """
+    Builds a complete index off to the side (nothing is published).
+    """
+    symbols = SymbolIndex()
+    documents, manifest = read_repo_files(repo_path, symbols=symbols)
+    commit = get_repo_commit(repo_path)
+    vector_store = create_vector_store(documents)
+    definition_chunks = build_definition_chunks(symbols, vector_store)
+
+    summaries = None
+    if REPO_SUMMARIES:
+        summaries = _load_cached_summaries(repo_id, commit)
+        if summaries is None:
+            try:
+                summaries = build_summaries(documents, symbols)
+            except Exception:
+                # Summaries are optional: publish the index without them
+                logger.exception("Summary generation failed for repo %s", repo_id)
+
+    return RepoIndex(
+        repo_id=repo_id,
+        repo_path=repo_path,
+        manifest=manifest,
+        vector_store=vector_store,
+        commit=commit,
+        path_index=PathIndex.from_manifest(manifest),
+        tree=RepoTree(repo_id, manifest, commit),
+        symbols=symbols,
+        symbol_chunks=build_symbol_chunk_map(symbols, definition_chunks),
+        definition_chunks=definition_chunks,
+        graph=CodeGraph.build(documents, symbols),
+        # Only for repos large enough to benefit (HIERARCHICAL_MIN_CHUNKS)
+        file_index=FileLevelIndex.build(vector_store),
+        summaries=summaries,
+    )
+
+
+def publish_index(index: RepoIndex):
+    """
+    Atomic swap: a single dict assignment.
+    Caches tied to the previous vector store are dropped.
+    """
+    if index.symbols is not None:
+        index.symbols.save(_symbols_file(index.repo_id, index.commit))
+    summaries_file = _summaries_file(index.repo_id, index.commit)
+    if index.summaries is not None and summaries_file:
+        save_summaries(index.summaries, summaries_file)
+    _save_checkout(index)
+    previous = _INDEXES.get(index.repo_id)
+    _INDEXES[index.repo_id] = index
+    invalidate_repo(index.repo_id)
+    invalidate_retrieval(index.repo_id)
+
+    keep = {index.repo_path}
+    if previous is not None:
+        keep.add(previous.repo_path)
+    _prune_checkouts(index.repo_id, keep)
+
+
+def _prune_checkouts(repo_id: str, keep: set):
+    """
+    Remove superseded checkouts of a repo. The new one and the one it
+    replaced (readers may still hold that snapshot) stay; in-progress
+    clones (dot-prefixed temp dirs) are left alone.
+    """
+    root = repo_checkout_root(repo_id)
+    if not os.path.isdir(root):
+        return
+
+    keep = {os.path.abspath(p) for p in keep if p}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(".") or os.path.abspath(path) in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def index_repo(repo_id: str, repo_path: str) -> RepoIndex:
+    """
+    Build + publish, one writer per repo at a time.
+    """
+    with repo_write_lock(repo_id):
+        index = build_index(repo_id, repo_path)
+        publish_index(index)
+        return index
@@ -0,0 +1,113 @@
+# repo_tree.py
+import hashlib
+import json
+
+
+def format_folder_structure(manifest: dict) -> str:
+    lines = []
+    for folder, files in manifest.get("structure", {}).items():
+        if folder.startswith(".git"):
+            continue
+        folder_name = "repo" if folder == "." else folder
+        lines.append(f"{folder_name}/")
+        for f in files:
+            lines.append(f"  ├─ {f}")
+    return "\n".join(lines)
+
+
+def build_tree(manifest: dict) -> list[dict]:
+    tree = []
+
+    for folder, files in manifest.get("structure", {}).items():
+
+        # 🚫 Skip .git folder entirely
+        if folder.startswith(".git"):
+            continue
+
+        folder_path = "" if folder == "." else f"{folder}/".replace("\\", "/")
+
+        if folder_path:
+            tree.append({
+                "path": folder_path,
+                "type": "dir"
+            })
+
+        for f in files:
+            # 🚫 Skip .git files just in case
+            if f.startswith(".git"):
+                continue
+
+            tree.append({
+                "path": f"{folder_path}{f}",
+                "type": "file"
+            })
+
+    return tree
+
+
+def _parent(path: str) -> str:
+    stripped = path.rstrip("/")
+    return stripped.rsplit("/", 1)[0] + "/" if "/" in stripped else ""
+
+
+class RepoTree:
+    """
+    Tree of one indexed commit, serialized once at index time.
+    Serves the full payload as pre-encoded JSON with an ETag,
+    plus paginated per-directory children for lazy UIs.
+    """
+
+    def __init__(self, repo_id: str, manifest: dict, commit: str | None = None):
+        self.entries = build_tree(manifest)
+        self.text = format_folder_structure(manifest)
+
+        self.payload = json.dumps({
+            "repo_id": repo_id,
+            "tree": self.entries,
+        }).encode()
+
+        # Tied to the indexed commit; content digest when there is none
+        version = commit or hashlib.sha1(self.payload).hexdigest()
+        self.etag = f'"{version}"'
+
+        self.dirs = {e["path"] for e in self.entries if e["type"] == "dir"}
+        self.children = {}
+        for entry in self.entries:
+            self.children.setdefault(_parent(entry["path"]), []).append(entry)
+
+        for items in self.children.values():
+            items.sort(key=lambda e: (e["type"] != "dir", e["path"]))
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return self.etag in tags
+
+    def children_page(self, path: str, cursor: str | None = None, limit: int = 200):
+        """
+        Direct children of a directory ("" is the repo root).
+        cursor is an opaque offset returned as next_cursor.
+        """
+        path = path.strip().replace("\\", "/").lstrip("/")
+        if path and not path.endswith("/"):
+            path += "/"
+
+        if path and path not in self.dirs:
+            return None
+
+        items = self.children.get(path, [])
+        offset = int(cursor) if cursor and cursor.isdigit() else 0
+        limit = max(1, min(limit, 1000))
+
+        page = items[offset:offset + limit]
+        next_offset = offset + len(page)
+
+        return {
+            "path": path,
+            "children": page,
+            "total": len(items),
+            "next_cursor": str(next_offset) if next_offset < len(items) else None,
+        }
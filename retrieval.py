@@ -0,0 +1,247 @@
+# retrieval.py
+import os
+import re
+
+import numpy as np
+
+from embed import embed_query, QUERY_EMBEDDING_CACHE
+from utils.cache import TTLCache
+
+# (repo_id, commit, query, k) -> [docstore ids]
+RETRIEVAL_CACHE = TTLCache(
+    maxsize=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RETRIEVAL_CACHE_TTL", "300")),
+)
+
+
+# Vector k when definition chunks are pinned (they carry most of the signal)
+PINNED_K = int(os.getenv("PINNED_K", "8"))
+
+# With a call graph: smaller vector k, then expand top hits to neighbours
+GRAPH_SEARCH_K = int(os.getenv("GRAPH_SEARCH_K", "12"))
+GRAPH_EXPAND_FROM = int(os.getenv("GRAPH_EXPAND_FROM", "5"))
+GRAPH_EXPAND_TOKENS = int(os.getenv("GRAPH_EXPAND_TOKENS", "1500"))
+
+# Definition chunks pinned per symbol (long definitions span several)
+MAX_CHUNKS_PER_SYMBOL = 2
+
+# "main.py" names a file, not a symbol
+_FILE_SUFFIXES = {"py", "md", "txt"}
+
+_IDENTIFIER_RE = re.compile(r"`?([A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*)(\(\))?`?")
+
+
+def build_definition_chunks(symbols, vectorstore) -> dict[int, list[str]]:
+    """
+    symbol id -> docstore ids of the chunks holding its definition.
+    Built once per index.
+    """
+    by_file = {}
+    for doc_id in vectorstore.index_to_docstore_id.values():
+        meta = vectorstore.docstore.search(doc_id).metadata
+        if meta.get("start_line") is None:
+            continue
+        path = meta["file"].replace("\\", "/")
+        by_file.setdefault(path, []).append(
+            (meta["start_line"], meta["end_line"], doc_id)
+        )
+
+    for chunks in by_file.values():
+        chunks.sort()
+
+    definition_chunks = {}
+    for sid in range(len(symbols)):
+        path = symbols.paths[symbols.files[sid]]
+        start, end = symbols.starts[sid], symbols.ends[sid]
+        overlapping = [
+            doc_id
+            for s, e, doc_id in by_file.get(path, [])
+            if s <= end and e >= start
+        ]
+        if overlapping:
+            definition_chunks[sid] = overlapping[:MAX_CHUNKS_PER_SYMBOL]
+
+    return definition_chunks
+
+
+def build_symbol_chunk_map(symbols, definition_chunks: dict) -> dict[str, list[str]]:
+    """
+    symbol name (simple and qualified) -> definition chunk ids.
+    """
+    symbol_chunks = {}
+    for name, symbol_ids in symbols.by_name.items():
+        chunk_ids = []
+        for sid in symbol_ids:
+            chunk_ids.extend(definition_chunks.get(sid, []))
+        if chunk_ids:
+            symbol_chunks[name] = list(dict.fromkeys(chunk_ids))
+    return symbol_chunks
+
+
+def extract_identifiers(question: str) -> list[str]:
+    """
+    Tokens that look like code identifiers: backticked, called (),
+    dotted, snake_case or camelCase. Plain words are ignored so
+    "run" or "main" in prose don't pin unrelated definitions.
+    """
+    found = []
+    for match in _IDENTIFIER_RE.finditer(question):
+        token, call = match.group(1), match.group(2)
+        if token.rsplit(".", 1)[-1] in _FILE_SUFFIXES:
+            continue
+        quoted = match.group(0).startswith("`")
+        looks_like_code = (
+            quoted
+            or call
+            or "_" in token
+            or "." in token
+            or any(c.isupper() for c in token[1:])
+        )
+        if looks_like_code:
+            found.append(token)
+            # "module.func" → also try the last part
+            if "." in token:
+                found.append(token.rsplit(".", 1)[-1])
+    return list(dict.fromkeys(found))
+
+
+def pinned_chunk_ids(question: str, symbol_chunks: dict | None) -> list[str]:
+    if not symbol_chunks:
+        return []
+
+    ids = []
+    for name in extract_identifiers(question):
+        ids.extend(symbol_chunks.get(name, []))
+    return list(dict.fromkeys(ids))
+
+
+def expand_neighbours(vectorstore, ids: list[str], graph, definition_chunks: dict) -> list[str]:
+    """
+    Definition chunks of the call-graph neighbours (callees, then callers)
+    of symbols in the top hits, until GRAPH_EXPAND_TOKENS is spent.
+    """
+    selected = set(ids)
+    extra = []
+    used = 0
+
+    for doc_id in ids[:GRAPH_EXPAND_FROM]:
+        meta = vectorstore.docstore.search(doc_id).metadata
+        if meta.get("start_line") is None:
+            continue
+
+        path = meta["file"].replace("\\", "/")
+        for sid in graph.symbols_in_span(path, meta["start_line"], meta["end_line"]):
+            for neighbour in graph.neighbours(sid):
+                # Head of the definition is enough for context
+                for chunk_id in definition_chunks.get(neighbour, [])[:1]:
+                    if chunk_id in selected:
+                        continue
+
+                    # ~4 chars per token
+                    cost = len(vectorstore.docstore.search(chunk_id).page_content) // 4
+                    if used + cost > GRAPH_EXPAND_TOKENS:
+                        return extra
+
+                    selected.add(chunk_id)
+                    extra.append(chunk_id)
+                    used += cost
+
+    return extra
+
+
+def search_chunk_ids(vectorstore, query_vector, k: int, file_index=None) -> list[str]:
+    """
+    Raw FAISS search returning docstore ids (not documents),
+    so results can be cached cheaply.
+    With a FileLevelIndex (large repos) the search is two-stage:
+    top files first, then chunks within them.
+    """
+    vector = np.array([query_vector], dtype=np.float32)
+
+    if getattr(vectorstore, "_normalize_L2", False):
+        import faiss
+        faiss.normalize_L2(vector)
+
+    if file_index is not None:
+        return file_index.search(vectorstore, vector, k)
+
+    _, indices = vectorstore.index.search(vector, k)
+
+    return [
+        vectorstore.index_to_docstore_id[i]
+        for i in indices[0]
+        if i != -1
+    ]
+
+
+def retrieve(
+    vectorstore,
+    question: str,
+    k: int = 20,
+    index=None,
+):
+    """
+    Drop-in for vectorstore.similarity_search(question, k).
+    Query embeddings are LRU-cached; chunk ids are TTL-cached
+    per (repo_id, commit, query, k) when a RepoIndex is given.
+
+    Definition chunks of identifiers named in the question are pinned
+    first; the vector search then only needs PINNED_K extra chunks.
+    With a call graph, top hits are expanded to their neighbours
+    within GRAPH_EXPAND_TOKENS instead of padding k.
+    """
+    repo_id = index.repo_id if index is not None else None
+    commit = index.commit if index is not None else None
+    graph = index.graph if index is not None else None
+
+    cache_key = (repo_id, commit, question, k)
+    ids = RETRIEVAL_CACHE.get(cache_key) if repo_id else None
+
+    if ids is not None:
+        docs = [vectorstore.docstore.search(i) for i in ids]
+        # Docstore returns a "not found" string for ids of a replaced store
+        if not any(isinstance(d, str) for d in docs):
+            return docs
+
+    pinned = pinned_chunk_ids(
+        question, index.symbol_chunks if index is not None else None
+    )
+
+    search_k = k
+    if pinned:
+        search_k = min(k, PINNED_K)
+    elif graph is not None:
+        search_k = min(k, GRAPH_SEARCH_K)
+
+    searched = search_chunk_ids(
+        vectorstore,
+        embed_query(question),
+        search_k,
+        file_index=index.file_index if index is not None else None,
+    )
+    ids = list(dict.fromkeys(pinned + searched))
+
+    if graph is not None:
+        ids += expand_neighbours(vectorstore, ids, graph, index.definition_chunks)
+
+    if repo_id:
+        RETRIEVAL_CACHE.set(cache_key, ids)
+
+    return [vectorstore.docstore.search(i) for i in ids]
+
+
+def invalidate_retrieval(repo_id: str):
+    """
+    Chunk ids are only valid for one vector store instance;
+    called whenever a repo's store is rebuilt.
+    """
+    for key, _ in RETRIEVAL_CACHE.items():
+        if key[0] == repo_id:
+            RETRIEVAL_CACHE.pop(key)
+
+
+def retrieval_cache_stats() -> dict:
+    return {
+        "query_embeddings": QUERY_EMBEDDING_CACHE.stats(),
+        "retrieval_results": RETRIEVAL_CACHE.stats(),
+    }
@@ -7,8 +7,11 @@ def route_question(question: str):
         "repo structure",
         "how many files",
         "how many functions",
+        "how many classes",
+        "how many methods",
         "functions in",
-        "classes in"
+        "classes in",
+        "methods in"
     ]
 
     content_phrases = [
@@ -40,5 +43,9 @@ def route_question(question: str):
         if p in q:
             return "STRUCTURAL"
 
+    # 4️⃣ Symbol location ("where is X defined")
+    if q.startswith(("where is", "where are")) and "defined" in q:
+        return "STRUCTURAL"
+
     # Default → semantic reasoning
     return "SEMANTIC"
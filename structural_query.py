@@ -0,0 +1,157 @@
+# structural_query.py
+import re
+
+from path_index import normalize_path
+from symbol_index import KINDS
+
+MAX_LISTED = 200
+
+_KIND_WORDS = {
+    "function": ("function",),
+    "functions": ("function",),
+    "method": ("method",),
+    "methods": ("method",),
+    "class": ("class",),
+    "classes": ("class",),
+}
+
+_COUNT_RE = re.compile(
+    r"how many\s+(files|functions|methods|classes)"
+    r"(?:\s+(?:are\s+)?(?:there\s+)?(?:in|inside)\s+(?:the\s+)?([\w./\\-]+))?",
+    re.IGNORECASE,
+)
+_LIST_RE = re.compile(
+    r"(functions|methods|classes)\s+(?:are\s+)?(?:defined\s+)?(?:in|inside|of)\s+(?:the\s+)?([\w./\\-]+)",
+    re.IGNORECASE,
+)
+_WHERE_RE = re.compile(
+    r"where\s+(?:is|are)\s+(?:the\s+)?(?:function\s+|class\s+|method\s+)?`?([A-Za-z_][\w.]*)`?",
+    re.IGNORECASE,
+)
+
+# Targets that mean "the whole repository"
+_WHOLE_REPO = {"repo", "repository", "project", "codebase", "this", "it"}
+
+
+def _resolve_scope(index, target: str | None):
+    """
+    Returns (label, file_filter) or None when the target does not exist.
+    file_filter is a predicate over normalized relative paths.
+    """
+    if not target or target.lower() in _WHOLE_REPO:
+        return "the repository", lambda p: True
+
+    target = normalize_path(target).rstrip("./") or "."
+    if target == ".":
+        return "the repository", lambda p: True
+
+    path, _ = index.path_index.resolve(target)
+    if path is not None:
+        return path, lambda p: p == path
+
+    prefix = target + "/"
+    if any(p.startswith(prefix) for p in index.path_index.by_path):
+        return f"{target}/", lambda p: p.startswith(prefix)
+
+    return None
+
+
+def _symbols_in(index, kinds: tuple, file_filter) -> list[dict]:
+    symbols = index.symbols
+    kind_ids = {KINDS.index(k) for k in kinds}
+    file_ids = {i for i, p in enumerate(symbols.paths) if file_filter(p)}
+
+    return [
+        symbols.entry(i)
+        for i in range(len(symbols))
+        if symbols.kinds[i] in kind_ids and symbols.files[i] in file_ids
+    ]
+
+
+def _format_listing(entries: list[dict]) -> str:
+    lines = [
+        f"- `{e['qualified_name']}` ({e['kind']}, {e['file']}:{e['start_line']})"
+        for e in entries[:MAX_LISTED]
+    ]
+    if len(entries) > MAX_LISTED:
+        lines.append(f"- ... and {len(entries) - MAX_LISTED} more")
+    return "\n".join(lines)
+
+
+def _answer_count(index, noun: str, target: str | None) -> str:
+    scope = _resolve_scope(index, target)
+    if scope is None:
+        return f"❌ No file or directory named {target}."
+
+    label, file_filter = scope
+
+    if noun.lower() == "files":
+        count = sum(1 for p in index.path_index.by_path if file_filter(p))
+        return f"Number of files in {label}: {count}."
+
+    if noun.lower() == "functions":
+        functions = len(_symbols_in(index, ("function",), file_filter))
+        methods = len(_symbols_in(index, ("method",), file_filter))
+        return (
+            f"Number of functions in {label}: {functions} "
+            f"(plus {methods} methods)."
+        )
+
+    count = len(_symbols_in(index, _KIND_WORDS[noun.lower()], file_filter))
+    return f"Number of {noun.lower()} in {label}: {count}."
+
+
+def _answer_listing(index, noun: str, target: str) -> str:
+    scope = _resolve_scope(index, target)
+    if scope is None:
+        return f"❌ No file or directory named {target}."
+
+    label, file_filter = scope
+    kinds = _KIND_WORDS[noun.lower()]
+    if kinds == ("function",):
+        kinds = ("function", "method")
+
+    entries = _symbols_in(index, kinds, file_filter)
+    if not entries:
+        return f"No {noun.lower()} found in {label}."
+
+    return f"{noun.capitalize()} in {label} ({len(entries)}):\n\n" + _format_listing(entries)
+
+
+def _answer_where(index, name: str) -> str:
+    entries = index.symbols.lookup(name)
+    if not entries:
+        return f"❌ No definition named `{name}` found in the repository."
+
+    if len(entries) == 1:
+        e = entries[0]
+        return (
+            f"`{e['qualified_name']}` ({e['kind']}) is defined in "
+            f"{e['file']}, lines {e['start_line']}-{e['end_line']}."
+        )
+
+    return f"`{name}` is defined in {len(entries)} places:\n\n" + _format_listing(entries)
+
+
+def answer_structural(question: str, index) -> str | None:
+    """
+    Deterministic answers from the manifest + symbol index:
+    counts, per-file / per-directory listings and "where is X defined".
+    Returns None when the question isn't one of these (caller falls back).
+    """
+    if index.symbols is None or index.path_index is None:
+        return None
+
+    match = _COUNT_RE.search(question)
+    if match:
+        return _answer_count(index, match.group(1), match.group(2))
+
+    match = _LIST_RE.search(question)
+    if match:
+        return _answer_listing(index, match.group(1), match.group(2))
+
+    match = _WHERE_RE.search(question)
+    if match:
+        return _answer_where(index, match.group(1).rstrip("."))
+
+    return None
@@ -0,0 +1,193 @@
+# summaries.py
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Optional indexing stage (off by default: it costs one LLM call per file/dir)
+REPO_SUMMARIES = os.getenv("REPO_SUMMARIES", "0") == "1"
+
+# "openai" or "stub" (deterministic, offline; for tests / local runs)
+SUMMARY_CLIENT = os.getenv("SUMMARY_CLIENT", "openai")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+
+# Characters of a file sent to the summarizer
+SUMMARY_INPUT_CHARS = 4000
+
+# Characters of summaries put into an overview prompt
+OVERVIEW_CONTEXT_CHARS = int(os.getenv("OVERVIEW_CONTEXT_CHARS", "12000"))
+
+_SEPARATOR = "\n---\n"
+
+FILE_PROMPT = (
+    "Summarize what this source file does in 2-3 sentences. "
+    "Mention its main classes/functions and what it depends on."
+)
+
+DIRECTORY_PROMPT = (
+    "Summarize the role of this directory in 2-3 sentences, "
+    "based on the summaries of its files and subdirectories."
+)
+
+OVERVIEW_PHRASES = [
+    "architecture",
+    "work together",
+    "works together",
+    "overview",
+    "high level",
+    "high-level",
+    "what does this repo",
+    "what does this project",
+    "what is this repo",
+    "what is this project",
+]
+
+
+# -----------------------------
+# LLM CLIENTS (pluggable)
+# -----------------------------
+class OpenAISummaryClient:
+    def __init__(self, model: str = "gpt-4o-mini"):
+        from langchain_openai import ChatOpenAI
+        self.llm = ChatOpenAI(model=model, temperature=0)
+
+    def complete(self, prompt: str) -> str:
+        return self.llm.invoke(prompt).content.strip()
+
+
+class StubSummaryClient:
+    """
+    Offline stand-in: first lines of the subject, no network.
+    """
+
+    def complete(self, prompt: str) -> str:
+        subject = prompt.rsplit(_SEPARATOR, 1)[-1]
+        lines = [l.strip() for l in subject.splitlines() if l.strip()]
+        return " ".join(lines[:3])[:300]
+
+
+def get_summary_client():
+    if SUMMARY_CLIENT == "stub":
+        return StubSummaryClient()
+    return OpenAISummaryClient()
+
+
+# -----------------------------
+# BUILD
+# -----------------------------
+def _parent_dir(path: str) -> str:
+    return path.rsplit("/", 1)[0] if "/" in path else "."
+
+
+def build_summaries(documents: list[dict], symbols=None, client=None) -> dict:
+    """
+    {"files": {path: summary}, "dirs": {dir: summary}}, "." being the repo.
+    Files are summarized from their content, directories bottom-up
+    from their children's summaries.
+    """
+    client = client or get_summary_client()
+
+    defined_in = {}
+    if symbols is not None:
+        for i in range(len(symbols)):
+            defined_in.setdefault(symbols.paths[symbols.files[i]], []).append(symbols.names[i])
+
+    def summarize_file(doc):
+        path = doc["metadata"]["file"].replace("\\", "/")
+        defined = defined_in.get(path, [])
+
+        prompt = (
+            f"{FILE_PROMPT}\nFile: {path}\n"
+            + (f"Defines: {', '.join(defined[:50])}\n" if defined else "")
+            + _SEPARATOR
+            + doc["text"][:SUMMARY_INPUT_CHARS]
+        )
+        return path, client.complete(prompt)
+
+    with ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY) as pool:
+        files = dict(pool.map(summarize_file, documents))
+
+    # Every ancestor directory of an indexed file
+    children = {}
+    for path in files:
+        child, parent = path, _parent_dir(path)
+        while True:
+            children.setdefault(parent, set()).add(child)
+            if parent == ".":
+                break
+            child, parent = parent, _parent_dir(parent)
+
+    dirs = {}
+    # Deepest first, so subdirectory summaries exist before their parent's
+    for directory in sorted(children, key=lambda d: d.count("/") + (d != "."), reverse=True):
+        lines = []
+        for child in sorted(children[directory]):
+            summary = dirs.get(child) if child in children else files.get(child)
+            label = f"{child}/" if child in children else child
+            lines.append(f"- {label}: {summary}")
+
+        prompt = (
+            f"{DIRECTORY_PROMPT}\nDirectory: {directory}\n"
+            + _SEPARATOR
+            + "\n".join(lines)[:SUMMARY_INPUT_CHARS]
+        )
+        dirs[directory] = client.complete(prompt)
+
+    return {"files": files, "dirs": dirs}
+
+
+def save_summaries(summaries: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summaries, f)
+    os.replace(tmp_path, path)
+
+
+def load_summaries(path: str) -> dict | None:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# -----------------------------
+# USE
+# -----------------------------
+def is_overview_question(question: str) -> bool:
+    q = question.lower()
+    return any(p in q for p in OVERVIEW_PHRASES)
+
+
+def render_directory_summaries(summaries: dict) -> str:
+    return "\n".join(
+        f"{'repo' if d == '.' else d + '/'} — {summaries['dirs'][d]}"
+        for d in sorted(summaries["dirs"], key=lambda d: (d != ".", d))
+    )
+
+
+def render_overview_context(summaries: dict, max_chars: int = OVERVIEW_CONTEXT_CHARS) -> str:
+    """
+    Directory summaries (shallowest first), then file summaries,
+    until max_chars.
+    """
+    lines = []
+    for directory in sorted(summaries["dirs"], key=lambda d: (d != ".", d.count("/"), d)):
+        label = "repo" if directory == "." else f"{directory}/"
+        lines.append(f"{label}: {summaries['dirs'][directory]}")
+
+    for path in sorted(summaries["files"]):
+        lines.append(f"{path}: {summaries['files'][path]}")
+
+    out, used = [], 0
+    for line in lines:
+        if used + len(line) > max_chars:
+            break
+        out.append(line)
+        used += len(line) + 1
+
+    return "\n".join(out)
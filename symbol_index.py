@@ -0,0 +1,214 @@
+# symbol_index.py
+import ast
+import json
+import os
+from array import array
+
+# tree-sitter is optional: without it Python falls back to the stdlib ast
+try:
+    from tree_sitter import Language, Parser
+    import tree_sitter_python
+except ImportError:
+    Language = Parser = tree_sitter_python = None
+
+KINDS = ("function", "method", "class")
+_KIND_IDS = {k: i for i, k in enumerate(KINDS)}
+
+# extension -> tree-sitter grammar module
+LANGUAGES = {
+    ".py": tree_sitter_python,
+}
+
+_PARSERS = {}
+
+
+def _parser_for(ext: str):
+    grammar = LANGUAGES.get(ext)
+    if grammar is None or Parser is None:
+        return None
+
+    if ext not in _PARSERS:
+        language = Language(grammar.language())
+        try:
+            parser = Parser(language)
+        except TypeError:
+            # py-tree-sitter < 0.22
+            parser = Parser()
+            parser.set_language(language)
+        _PARSERS[ext] = parser
+    return _PARSERS[ext]
+
+
+# -----------------------------
+# EXTRACTION
+# -----------------------------
+def _walk_tree_sitter(node, scope: list, in_class: bool, out: list):
+    for child in node.children:
+        target = child
+        if child.type == "decorated_definition":
+            target = child.child_by_field_name("definition") or child
+
+        if target.type in ("function_definition", "class_definition"):
+            name_node = target.child_by_field_name("name")
+            name = name_node.text.decode("utf-8", errors="ignore")
+            is_class = target.type == "class_definition"
+
+            kind = "class" if is_class else ("method" if in_class else "function")
+            out.append((
+                kind,
+                ".".join(scope + [name]),
+                target.start_point[0] + 1,
+                target.end_point[0] + 1,
+            ))
+
+            body = target.child_by_field_name("body")
+            if body is not None:
+                _walk_tree_sitter(body, scope + [name], is_class, out)
+        else:
+            _walk_tree_sitter(child, scope, in_class, out)
+
+
+def _walk_ast(node, scope: list, in_class: bool, out: list):
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            is_class = isinstance(child, ast.ClassDef)
+            kind = "class" if is_class else ("method" if in_class else "function")
+            out.append((
+                kind,
+                ".".join(scope + [child.name]),
+                child.lineno,
+                child.end_lineno or child.lineno,
+            ))
+            _walk_ast(child, scope + [child.name], is_class, out)
+        else:
+            _walk_ast(child, scope, in_class, out)
+
+
+def extract_symbols(path: str, source: str) -> list[tuple]:
+    """
+    [(kind, qualified_name, start_line, end_line)] for one file.
+    Covers methods, async defs and nested definitions.
+    """
+    ext = os.path.splitext(path)[1]
+    out = []
+
+    parser = _parser_for(ext)
+    if parser is not None:
+        tree = parser.parse(source.encode("utf-8"))
+        _walk_tree_sitter(tree.root_node, [], False, out)
+        return out
+
+    if ext == ".py":
+        try:
+            _walk_ast(ast.parse(source), [], False, out)
+        except (SyntaxError, ValueError):
+            pass
+
+    return out
+
+
+def supports(path: str) -> bool:
+    return os.path.splitext(path)[1] in LANGUAGES
+
+
+# -----------------------------
+# INDEX
+# -----------------------------
+class SymbolIndex:
+    """
+    Definitions of one commit in compact parallel arrays
+    (kind, qualified name, file, line span) plus a
+    name -> symbol ids dictionary for lookups.
+    Both the simple name and the qualified name are keys.
+    """
+
+    def __init__(self):
+        self.paths = []
+        self._path_ids = {}
+
+        self.kinds = array("B")
+        self.files = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.names = []
+
+        self.by_name = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_file(self, path: str, symbols: list[tuple]):
+        path = path.replace("\\", "/")
+        file_id = self._path_ids.get(path)
+        if file_id is None:
+            file_id = self._path_ids[path] = len(self.paths)
+            self.paths.append(path)
+
+        for kind, qualname, start, end in symbols:
+            self._append(_KIND_IDS[kind], file_id, start, end, qualname)
+
+    def _append(self, kind_id: int, file_id: int, start: int, end: int, qualname: str):
+        symbol_id = len(self.names)
+
+        self.kinds.append(kind_id)
+        self.files.append(file_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.names.append(qualname)
+
+        self.by_name.setdefault(qualname, []).append(symbol_id)
+        simple = qualname.rsplit(".", 1)[-1]
+        if simple != qualname:
+            self.by_name.setdefault(simple, []).append(symbol_id)
+
+    def entry(self, symbol_id: int) -> dict:
+        qualname = self.names[symbol_id]
+        return {
+            "kind": KINDS[self.kinds[symbol_id]],
+            "name": qualname.rsplit(".", 1)[-1],
+            "qualified_name": qualname,
+            "file": self.paths[self.files[symbol_id]],
+            "start_line": self.starts[symbol_id],
+            "end_line": self.ends[symbol_id],
+        }
+
+    def lookup(self, name: str) -> list[dict]:
+        return [self.entry(i) for i in self.by_name.get(name, [])]
+
+    # -----------------------------
+    # PERSISTENCE (one file per commit)
+    # -----------------------------
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "paths": self.paths,
+                "kinds": self.kinds.tolist(),
+                "files": self.files.tolist(),
+                "starts": self.starts.tolist(),
+                "ends": self.ends.tolist(),
+                "names": self.names,
+            }, f)
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SymbolIndex | None":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        index = cls()
+        index.paths = data["paths"]
+        index._path_ids = {p: i for i, p in enumerate(index.paths)}
+
+        for kind_id, file_id, start, end, qualname in zip(
+            data["kinds"], data["files"], data["starts"], data["ends"], data["names"]
+        ):
+            index._append(kind_id, file_id, start, end, qualname)
+
+        return index
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from llm_scheduler import LLMScheduler
+
+
+def _wait_queued(scheduler, n, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while scheduler.stats()["queued"] < n:
+        assert time.monotonic() < deadline, "calls never queued"
+        time.sleep(0.001)
+
+
+def _queue_call(scheduler, tenant, order, timeout=5.0):
+    def run():
+        with scheduler.slot(tenant, timeout=timeout):
+            order.append(tenant)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_fair_ordering_interleaves_tenants():
+    scheduler = LLMScheduler(max_concurrency=1, tenant_concurrency=1, tenant_max_queued=10)
+    order = []
+    threads = []
+
+    with scheduler.slot("holder"):
+        # a queues a backlog before b shows up
+        for i, tenant in enumerate(["a", "a", "a", "b"]):
+            threads.append(_queue_call(scheduler, tenant, order))
+            _wait_queued(scheduler, i + 1)
+
+    for thread in threads:
+        thread.join(5)
+
+    # FIFO would be a, a, a, b
+    assert order == ["a", "b", "a", "a"]
+
+
+def test_timeout_restores_finish_tag():
+    scheduler = LLMScheduler(max_concurrency=1, tenant_concurrency=1)
+
+    with scheduler.slot("b"):
+        pass
+    tag = scheduler._last_finish["b"]
+
+    with scheduler.slot("holder"):
+        with pytest.raises(TimeoutError):
+            with scheduler.slot("b", timeout=0.05):
+                pass
+
+        # A tenant with no previous tag is forgotten again
+        with pytest.raises(TimeoutError):
+            with scheduler.slot("c", timeout=0.05):
+                pass
+
+    assert scheduler._last_finish["b"] == tag
+    assert "c" not in scheduler._last_finish
+    assert scheduler.stats()["timeouts"] == 2
+
+
+def test_queue_depth_rejects_immediately():
+    scheduler = LLMScheduler(max_concurrency=1, tenant_concurrency=1, tenant_max_queued=1)
+    order = []
+
+    with scheduler.slot("holder"):
+        thread = _queue_call(scheduler, "a", order)
+        _wait_queued(scheduler, 1)
+
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with scheduler.slot("a", timeout=5):
+                pass
+        assert time.monotonic() - started < 1
+
+    thread.join(5)
+    assert order == ["a"]
+    assert scheduler.stats()["rejected"] == 1
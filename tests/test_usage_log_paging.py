@@ -0,0 +1,85 @@
+import importlib
+
+import pytest
+
+from utils.sqlite_store import SQLiteMetadataStore
+
+
+def _seed(store, key_id="k1", n=7):
+    # Three rows per timestamp, so pages split inside a tie
+    store.table("api_usage_logs").insert([
+        {
+            "api_key_id": key_id,
+            "endpoint": f"/e{i}",
+            "status_code": 500 if i % 3 == 0 else 200,
+            "created_at": f"2026-01-01T00:00:0{i // 3}Z",
+        }
+        for i in range(n)
+    ]).execute()
+
+
+def test_sqlite_or_keyset_filter(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "meta.db"))
+    _seed(store)
+
+    rows = (
+        store.table("api_usage_logs")
+        .select("id, created_at")
+        .or_('created_at.lt."2026-01-01T00:00:01Z",and(created_at.eq."2026-01-01T00:00:01Z",id.lt.5)')
+        .order("id", desc=True)
+        .execute()
+        .data
+    )
+
+    assert [r["id"] for r in rows] == [4, 3, 2, 1]
+
+
+def test_sqlite_exact_count(tmp_path):
+    store = SQLiteMetadataStore(str(tmp_path / "meta.db"))
+    _seed(store)
+
+    resp = (
+        store.table("api_usage_logs")
+        .select("id", count="exact")
+        .gte("status_code", 400)
+        .limit(1)
+        .execute()
+    )
+
+    assert resp.count == 3
+    assert len(resp.data) == 1
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    pytest.importorskip("dotenv")
+    monkeypatch.setenv("METADATA_BACKEND", "sqlite")
+    monkeypatch.setenv("METADATA_SQLITE_PATH", str(tmp_path / "meta.db"))
+
+    module = importlib.import_module("auth.api_key_service")
+    store = SQLiteMetadataStore(str(tmp_path / "meta.db"))
+    monkeypatch.setattr(module, "supabase", store)
+    return module, store
+
+
+def test_cursor_pages_across_equal_timestamps(service):
+    module, store = service
+    _seed(store, n=8)
+    _seed(store, key_id="other", n=3)
+
+    seen, cursor = [], None
+    while True:
+        page = module.usage_logs_page_internal(key_id="k1", cursor=cursor, limit=3)
+        seen.extend(row["id"] for row in page["logs"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_malformed_cursor_raises(service):
+    module, _ = service
+
+    with pytest.raises(ValueError):
+        module.usage_logs_page_internal(key_id="k1", cursor="not-a-cursor")
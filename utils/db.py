@@ -0,0 +1,242 @@
+# utils/db.py
+import inspect
+import os
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -----------------------------
+# Connection settings (shared by every module)
+# -----------------------------
+# "supabase" (default) or "sqlite" (local file, WAL; single node / offline)
+METADATA_BACKEND = os.getenv("METADATA_BACKEND", "supabase")
+METADATA_SQLITE_PATH = os.getenv("METADATA_SQLITE_PATH", "metadata.db")
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+
+# Latency samples kept per (table, operation) for percentiles
+LATENCY_SAMPLES = 512
+
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+
+# -----------------------------
+# Per-query latency metrics
+# -----------------------------
+_METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def _record(table: str, operation: str, elapsed_ms: float, failed: bool):
+    with _METRICS_LOCK:
+        m = _METRICS.setdefault((table, operation), {
+            "count": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "samples": deque(maxlen=LATENCY_SAMPLES),
+        })
+        m["count"] += 1
+        m["errors"] += failed
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+        m["samples"].append(elapsed_ms)
+
+
+def query_metrics() -> dict:
+    out = {}
+    with _METRICS_LOCK:
+        for (table, operation), m in sorted(_METRICS.items()):
+            samples = sorted(m["samples"])
+            out[f"{table}.{operation}"] = {
+                "count": m["count"],
+                "errors": m["errors"],
+                "avg_ms": round(m["total_ms"] / m["count"], 2),
+                "p50_ms": round(samples[len(samples) // 2], 2),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                "max_ms": round(m["max_ms"], 2),
+            }
+    return out
+
+
+class _TimedQuery:
+    """
+    Wraps a postgrest query builder; execute() is timed and
+    recorded under (table, first operation). Works for sync and
+    async builders.
+    """
+
+    def __init__(self, builder, table: str, operation: str | None = None):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            operation = self._operation
+            if operation is None and name in _OPERATIONS:
+                operation = name
+            return _TimedQuery(result, self._table, operation)
+
+        return call
+
+    def execute(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            result = self._builder.execute(*args, **kwargs)
+        except Exception:
+            self._done(start, failed=True)
+            raise
+
+        if inspect.isawaitable(result):
+            return self._await(result, start)
+
+        self._done(start)
+        return result
+
+    async def _await(self, result, start):
+        try:
+            result = await result
+        except Exception:
+            self._done(start, failed=True)
+            raise
+        self._done(start)
+        return result
+
+    def _done(self, start: float, failed: bool = False):
+        _record(
+            self._table,
+            self._operation or "query",
+            (time.monotonic() - start) * 1000,
+            failed,
+        )
+
+
+class _TimedClient:
+    """
+    Drop-in for the supabase client: table() / from_() / rpc()
+    return timed builders, everything else passes through.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name: str):
+        return _TimedQuery(self._client.table(name), name)
+
+    def from_(self, name: str):
+        return _TimedQuery(self._client.from_(name), name)
+
+    def rpc(self, fn: str, params: dict | None = None, *args, **kwargs):
+        return _TimedQuery(
+            self._client.rpc(fn, params or {}, *args, **kwargs), f"rpc:{fn}", "call"
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# -----------------------------
+# Shared clients
+# -----------------------------
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+_ASYNC_CLIENT = None
+_ASYNC_LOCK = threading.Lock()
+
+
+def _client_options(is_async: bool):
+    """
+    One keep-alive pool sized by SUPABASE_POOL_SIZE. Older supabase
+    releases don't accept a custom httpx client; they still get the
+    timeout, with the library's default pool.
+    """
+    import httpx
+
+    limits = httpx.Limits(
+        max_connections=SUPABASE_POOL_SIZE,
+        max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+    )
+
+    if is_async:
+        from supabase import AsyncClientOptions as Options
+        http_client = httpx.AsyncClient(limits=limits, timeout=SUPABASE_TIMEOUT)
+    else:
+        from supabase import ClientOptions as Options
+        http_client = httpx.Client(limits=limits, timeout=SUPABASE_TIMEOUT)
+
+    try:
+        return Options(
+            httpx_client=http_client,
+            postgrest_client_timeout=SUPABASE_TIMEOUT,
+        )
+    except TypeError:
+        return Options(postgrest_client_timeout=SUPABASE_TIMEOUT)
+
+
+def _create_client():
+    if METADATA_BACKEND == "sqlite":
+        from utils.sqlite_store import SQLiteMetadataStore
+        return SQLiteMetadataStore(METADATA_SQLITE_PATH)
+
+    from supabase import create_client
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_SERVICE_KEY,
+        options=_client_options(is_async=False),
+    )
+
+
+def get_supabase():
+    """
+    Process-wide metadata client (thread-safe, created once).
+    Backed by Supabase or local SQLite, per METADATA_BACKEND;
+    both expose the same table(...)...execute() interface.
+    """
+    global _CLIENT
+
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = _TimedClient(_create_client())
+
+    return _CLIENT
+
+
+async def get_async_supabase():
+    """
+    Async variant for code running on the event loop.
+    """
+    global _ASYNC_CLIENT
+
+    if _ASYNC_CLIENT is None:
+        if METADATA_BACKEND == "sqlite":
+            from utils.sqlite_store import SQLiteMetadataStore
+            client = SQLiteMetadataStore(METADATA_SQLITE_PATH, is_async=True)
+        else:
+            from supabase import acreate_client
+            client = await acreate_client(
+                SUPABASE_URL,
+                SUPABASE_SERVICE_KEY,
+                options=_client_options(is_async=True),
+            )
+        with _ASYNC_LOCK:
+            if _ASYNC_CLIENT is None:
+                _ASYNC_CLIENT = _TimedClient(client)
+
+    return _ASYNC_CLIENT
@@ -0,0 +1,77 @@
+# utils/singleflight.py
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key:
+    the first caller runs fn, everyone else waits for its result.
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(
+        self,
+        key,
+        fn,
+        timeout: float | None = None,
+        background: bool = False,
+    ):
+        """
+        Returns (result, shared).
+        shared is True when the result came from another caller's flight.
+
+        Waiters raise TimeoutError if the flight outlasts timeout;
+        the flight itself keeps running. With background=True the
+        flight runs in its own thread, so the caller that started it
+        is bounded by timeout as well.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            return self._wait(key, call, timeout), True
+
+        if background:
+            threading.Thread(
+                target=self._run,
+                args=(key, call, fn),
+                daemon=True,
+            ).start()
+            return self._wait(key, call, timeout), False
+
+        self._run(key, call, fn)
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+    def _run(self, key, call: _Call, fn):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _wait(self, key, call: _Call, timeout: float | None):
+        if not call.event.wait(timeout):
+            raise TimeoutError(f"in-flight call for {key!r} still running")
+        if call.error is not None:
+            raise call.error
+        return call.result
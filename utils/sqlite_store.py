@@ -0,0 +1,431 @@
+# utils/sqlite_store.py
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+# -----------------------------
+# Schema (mirrors the Supabase tables)
+# -----------------------------
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS repos (
+    repo_id TEXT PRIMARY KEY,
+    repo_url TEXT,
+    credential_id TEXT,
+    indexed_at TEXT,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS api_keys (
+    id TEXT PRIMARY KEY,
+    key_hash TEXT NOT NULL UNIQUE,
+    name TEXT,
+    user_email TEXT,
+    status TEXT DEFAULT 'active',
+    environment TEXT,
+    scopes TEXT,
+    expires_at TEXT,
+    ip_allowlist TEXT,
+    rate_limits TEXT,
+    last_used_at TEXT,
+    created_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS api_keys_user_email ON api_keys (user_email);
+
+CREATE TABLE IF NOT EXISTS api_usage_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    request_id TEXT,
+    api_key_id TEXT,
+    endpoint TEXT,
+    method TEXT,
+    status_code INTEGER,
+    duration_ms INTEGER,
+    error_message TEXT,
+    created_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS api_usage_logs_key_created
+    ON api_usage_logs (api_key_id, created_at);
+
+CREATE TABLE IF NOT EXISTS credentials (
+    id TEXT PRIMARY KEY,
+    user_email TEXT,
+    provider TEXT,
+    label TEXT,
+    encrypted_token TEXT,
+    scopes TEXT,
+    expires_at TEXT,
+    status TEXT DEFAULT 'active',
+    created_at TEXT DEFAULT {_NOW}
+);
+CREATE INDEX IF NOT EXISTS credentials_user_email ON credentials (user_email);
+"""
+
+# Stored as JSON text, returned as Python objects
+JSON_COLUMNS = {
+    "api_keys": {"scopes", "ip_allowlist", "rate_limits"},
+    "credentials": {"scopes"},
+}
+
+# Text primary keys Supabase generates server-side
+GENERATED_IDS = {"api_keys": "id", "credentials": "id"}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+_FILTER_OPS = {
+    "eq": "=",
+    "neq": "!=",
+    "gt": ">",
+    "gte": ">=",
+    "lt": "<",
+    "lte": "<=",
+}
+
+
+def _split_top_level(text: str) -> list[str]:
+    """
+    Splits a PostgREST logic tree on commas outside parens / quotes.
+    """
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _column(name: str) -> str:
+    name = name.strip()
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Invalid column name: {name!r}")
+    return f'"{name}"'
+
+
+class QueryResult:
+    def __init__(self, data: list[dict], count: int | None = None):
+        self.data = data
+        self.count = count
+
+
+class SQLiteQuery:
+    """
+    The subset of the postgrest builder the app uses:
+    select / insert / update / upsert / delete, eq-style filters,
+    in_, is_, or_, order, limit, range, then execute().
+    """
+
+    def __init__(self, store: "SQLiteMetadataStore", table: str):
+        if table not in store.tables:
+            raise ValueError(f"Unknown table: {table}")
+
+        self._store = store
+        self._table = table
+        self._operation = None
+        self._columns = "*"
+        self._payload = None
+        self._on_conflict = None
+        self._filters = []
+        self._params = []
+        self._order = []
+        self._group_by = None
+        self._count = None
+        self._limit = None
+        self._offset = None
+
+    # ---------- operations ----------
+    def select(self, columns: str = "*", count=None):
+        """
+        "count()" aggregates like PostgREST: grouped by the other columns.
+        count="exact" also returns the total match count (ignoring limit).
+        """
+        self._operation = "select"
+        self._count = count
+        if columns.strip() == "*":
+            return self
+
+        parts = [c.strip() for c in columns.split(",")]
+        plain = [_column(c) for c in parts if c != "count()"]
+        selected = [
+            'COUNT(*) AS "count"' if c == "count()" else _column(c)
+            for c in parts
+        ]
+
+        self._columns = ", ".join(selected)
+        if "count()" in parts and plain:
+            self._group_by = ", ".join(plain)
+        return self
+
+    def insert(self, payload):
+        self._operation = "insert"
+        self._payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict: str | None = None):
+        self._operation = "upsert"
+        self._payload = payload
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, payload: dict):
+        self._operation = "update"
+        self._payload = payload
+        return self
+
+    def delete(self):
+        self._operation = "delete"
+        return self
+
+    # ---------- filters ----------
+    def _filter(self, op: str, column: str, value):
+        self._filters.append(f"{_column(column)} {_FILTER_OPS[op]} ?")
+        self._params.append(self._store.encode(self._table, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def in_(self, column, values):
+        values = list(values)
+        if not values:
+            self._filters.append("0")
+            return self
+        self._filters.append(f"{_column(column)} IN ({', '.join('?' * len(values))})")
+        self._params.extend(values)
+        return self
+
+    def is_(self, column, value):
+        if value is None or value == "null":
+            self._filters.append(f"{_column(column)} IS NULL")
+        else:
+            self._filters.append(f"{_column(column)} IS ?")
+            self._params.append(value)
+        return self
+
+    def or_(self, filters: str):
+        """
+        PostgREST logic tree, e.g. 'a.lt.1,and(a.eq.1,b.lt.2)'
+        (eq-style operators only; values may be double-quoted).
+        """
+        sql, params = self._logic_tree(filters, "OR")
+        self._filters.append(sql)
+        self._params.extend(params)
+        return self
+
+    def _logic_tree(self, filters: str, joiner: str) -> tuple[str, list]:
+        clauses, params = [], []
+
+        for term in _split_top_level(filters):
+            for nested in ("and", "or"):
+                if term.startswith(f"{nested}(") and term.endswith(")"):
+                    sql, nested_params = self._logic_tree(term[len(nested) + 1:-1], nested.upper())
+                    break
+            else:
+                column, op, value = term.split(".", 2)
+                if op not in _FILTER_OPS:
+                    raise ValueError(f"Unsupported operator in or_: {op!r}")
+                if len(value) >= 2 and value[0] == value[-1] == '"':
+                    value = value[1:-1]
+                sql = f"{_column(column)} {_FILTER_OPS[op]} ?"
+                nested_params = [self._store.encode(self._table, column, value)]
+
+            clauses.append(sql)
+            params.extend(nested_params)
+
+        return f"({f' {joiner} '.join(clauses)})", params
+
+    # ---------- modifiers ----------
+    def order(self, column: str, desc: bool = False):
+        self._order.append(f"{_column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size: int):
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int):
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ---------- execution ----------
+    def _where(self) -> str:
+        return f" WHERE {' AND '.join(self._filters)}" if self._filters else ""
+
+    def _build(self) -> list[tuple[str, list]]:
+        table = _column(self._table)
+
+        if self._operation == "select":
+            sql = f"SELECT {self._columns} FROM {table}{self._where()}"
+            if self._group_by:
+                sql += f" GROUP BY {self._group_by}"
+            if self._order:
+                sql += f" ORDER BY {', '.join(self._order)}"
+            if self._limit is not None:
+                sql += f" LIMIT {self._limit}"
+                if self._offset:
+                    sql += f" OFFSET {self._offset}"
+            return [(sql, self._params)]
+
+        if self._operation in ("insert", "upsert"):
+            rows = self._payload if isinstance(self._payload, list) else [self._payload]
+            statements = []
+            for row in rows:
+                row = self._store.with_generated_id(self._table, row)
+                columns = ", ".join(_column(c) for c in row)
+                sql = (
+                    f"INSERT INTO {table} ({columns}) "
+                    f"VALUES ({', '.join('?' * len(row))})"
+                )
+                if self._operation == "upsert":
+                    conflict = _column(self._on_conflict or self._store.primary_key(self._table))
+                    updates = ", ".join(f"{_column(c)} = excluded.{_column(c)}" for c in row)
+                    sql += f" ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+                statements.append((
+                    sql + " RETURNING *",
+                    [self._store.encode(self._table, c, v) for c, v in row.items()],
+                ))
+            return statements
+
+        if self._operation == "update":
+            assignments = ", ".join(f"{_column(c)} = ?" for c in self._payload)
+            params = [self._store.encode(self._table, c, v) for c, v in self._payload.items()]
+            return [(
+                f"UPDATE {table} SET {assignments}{self._where()} RETURNING *",
+                params + self._params,
+            )]
+
+        if self._operation == "delete":
+            return [(f"DELETE FROM {table}{self._where()} RETURNING *", self._params)]
+
+        raise ValueError("No operation: call select/insert/update/upsert/delete first")
+
+    def _run(self) -> QueryResult:
+        data = self._store.run(self._table, self._build())
+
+        count = None
+        if self._operation == "select" and self._count == "exact":
+            sql = f"SELECT COUNT(*) AS \"count\" FROM {_column(self._table)}{self._where()}"
+            count = self._store.run(self._table, [(sql, self._params)])[0]["count"]
+
+        return QueryResult(data, count)
+
+    def execute(self):
+        if self._store.is_async:
+            return asyncio.to_thread(self._run)
+        return self._run()
+
+
+class SQLiteMetadataStore:
+    """
+    Local metadata backend with the same table()/execute() surface as
+    the Supabase client, so call sites don't change. WAL mode, one
+    connection per thread, indexes on key_hash / repo_id / api_key_id.
+    """
+
+    def __init__(self, path: str, is_async: bool = False):
+        self.path = path
+        self.is_async = is_async
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+
+        self.tables = {
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            if not row[0].startswith("sqlite_")
+        }
+        self._primary_keys = {
+            table: next(
+                (c[1] for c in conn.execute(f"PRAGMA table_info({_column(table)})") if c[5]),
+                "id",
+            )
+            for table in self.tables
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def table(self, name: str) -> SQLiteQuery:
+        return SQLiteQuery(self, name)
+
+    from_ = table
+
+    def primary_key(self, table: str) -> str:
+        return self._primary_keys[table]
+
+    def with_generated_id(self, table: str, row: dict) -> dict:
+        column = GENERATED_IDS.get(table)
+        if column and row.get(column) is None:
+            row = {**row, column: str(uuid.uuid4())}
+        return row
+
+    def encode(self, table: str, column: str, value):
+        if column in JSON_COLUMNS.get(table, ()) and value is not None:
+            return json.dumps(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def _decode(self, table: str, row: sqlite3.Row) -> dict:
+        out = dict(row)
+        for column in JSON_COLUMNS.get(table, ()):
+            if isinstance(out.get(column), str):
+                out[column] = json.loads(out[column])
+        return out
+
+    def run(self, table: str, statements: list[tuple[str, list]]) -> list[dict]:
+        conn = self._connection()
+
+        if len(statements) == 1 and statements[0][0].startswith("SELECT"):
+            sql, params = statements[0]
+            return [self._decode(table, r) for r in conn.execute(sql, params)]
+
+        # Writes: one transaction per execute(), serialized in-process
+        rows = []
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    rows.extend(self._decode(table, r) for r in conn.execute(sql, params).fetchall())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows